@@ -1,12 +1,20 @@
 from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.applications import get_swagger_ui_html
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 from src.app.models import User
-from src.app.db import create_db_and_tables
+from src.app.db import verify_schema_version, warm_up_connection_pool
+from src.app.cache import start_invalidation_listener, stop_invalidation_listener
+from src.app.limits import concurrency_limiter, get_limits_stats, rate_limit
+from src.utils.logging_util import AccessLogMiddleware
+from src.utils.rate_limit import ConcurrencyLimitMiddleware
 from src.app.users import current_active_user
 from src.routers import films, auth, users, statuses
 
 app = FastAPI(title='Posmotrim API', description='Бэкенд сервиса Посмотрим')
+app.add_middleware(ConcurrencyLimitMiddleware, limiter=concurrency_limiter)
+app.add_middleware(AccessLogMiddleware)
 
 
 # Регистрация и авторизация
@@ -19,10 +27,11 @@ app.include_router(auth.verify_router, prefix="/auth", tags=['auth'])
 app.include_router(users.users_router, prefix="/users", tags=['users'])
 
 # Фильмы
-app.include_router(films.router, prefix="/films", tags=['films'])
+app.include_router(films.router, prefix="/films", tags=['films'], dependencies=[Depends(rate_limit)])
 
 # Статусы
-app.include_router(statuses.statuses_router, prefix="/statuses", tags=['statuses'])
+app.include_router(statuses.statuses_router, prefix="/statuses", tags=['statuses'],
+                   dependencies=[Depends(rate_limit)])
 
 
 @app.get("/authenticated-route")
@@ -36,12 +45,42 @@ async def authenticated_route(user: User = Depends(current_active_user)) -> dict
     return {"message": f"Добро пожаловать {user.email}!"}
 
 
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError) -> JSONResponse:
+    """
+    Нет свободного соединения с БД за DB_POOL_TIMEOUT: отвечаем 503, чтобы клиент повторил позже
+    """
+    return JSONResponse(status_code=503,
+                        content={"detail": "Server is overloaded, try again later"},
+                        headers={"Retry-After": "1"})
+
+
+@app.get('/metrics/limits', include_in_schema=False)
+async def limits_metrics() -> dict:
+    """
+    Счетчики ограничения частоты и одновременности запросов текущего воркера
+    """
+    return get_limits_stats()
+
+
 @app.on_event("startup")
 async def on_startup() -> None:
     """
-    Инициализация БД и таблиц в ней при запуске сервиса
+    Проверка версии схемы БД и прогрев пула соединений и кэша до приема запросов.
+    Сама схема меняется отдельным шагом: alembic upgrade head
+    """
+    await verify_schema_version()
+    await warm_up_connection_pool()
+    await films.warm_up_film_cache()
+    await start_invalidation_listener()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    """
+    Остановка фоновых задач воркера
     """
-    await create_db_and_tables()
+    await stop_invalidation_listener()
 
 
 @app.get('/docs', include_in_schema=False)
@@ -0,0 +1,121 @@
+import asyncio
+from typing import List, Optional
+
+from src.app.schemas import StatusEnum
+from src.config import (
+    CACHE_BACKEND,
+    CACHE_TTL,
+    CACHE_MAXSIZE,
+    DB_REPLICA_STICKINESS_SECONDS,
+    REDIS_URL,
+    REPLICA_DATABASE_URLS,
+    USER_CACHE_TTL,
+    USER_CACHE_MAXSIZE,
+    WEB_CONCURRENCY
+)
+from src.utils.cache import CacheBackend, InMemoryCacheBackend, RedisCacheBackend, RedisInvalidationBus
+
+
+def get_redis_client():
+    """
+    Возвращает клиент Redis по REDIS_URL. redis - необязательная зависимость
+    """
+    from redis import asyncio as redis
+
+    return redis.from_url(REDIS_URL)
+
+
+redis_client = get_redis_client() if REDIS_URL else None
+invalidation_bus = RedisInvalidationBus(redis_client) if redis_client is not None else None
+
+
+def check_cache_for_workers(workers: int) -> None:
+    """
+    Проверяет, что кэши подходят для нескольких воркеров. Локальные кэши без рассылки инвалидаций
+    через Redis расходятся: после записи в одном воркере другие отдают старые статусы до CACHE_TTL,
+    а деактивированный пользователь остается авторизованным до USER_CACHE_TTL
+
+    :param workers: количество воркеров
+    """
+    if workers > 1 and not REDIS_URL and (CACHE_TTL > 0 or USER_CACHE_TTL > 0):
+        raise Exception('Several workers require REDIS_URL for cache invalidation '
+                        '(or CACHE_TTL=0 and USER_CACHE_TTL=0)')
+
+
+def build_cache_backend() -> CacheBackend:
+    """
+    Создает кэш фильмов, жанров и статусов пользователей согласно CACHE_BACKEND
+    """
+    check_cache_for_workers(WEB_CONCURRENCY)
+    if CACHE_BACKEND == 'memory':
+        return InMemoryCacheBackend(ttl=CACHE_TTL, maxsize=CACHE_MAXSIZE, bus=invalidation_bus)
+    if CACHE_BACKEND == 'redis':
+        if redis_client is None:
+            raise Exception('CACHE_BACKEND=redis requires REDIS_URL')
+        return RedisCacheBackend(redis_client, ttl=CACHE_TTL)
+    raise Exception(f'Unknown CACHE_BACKEND: {CACHE_BACKEND}')
+
+
+cache = build_cache_backend()
+
+# Списки статусов, прочитанные с реплики, могут отставать от основной БД, а привязка к основной БД
+# после записи видна не во всех воркерах. Поэтому с репликами списки хранятся не дольше окна привязки
+user_statuses_ttl = min(CACHE_TTL, DB_REPLICA_STICKINESS_SECONDS) if REPLICA_DATABASE_URLS else CACHE_TTL
+
+# Пользователи, найденные по JWT. Хранятся экземпляры моделей, поэтому кэш всегда локальный
+user_cache = InMemoryCacheBackend(ttl=USER_CACHE_TTL, maxsize=USER_CACHE_MAXSIZE, bus=invalidation_bus)
+
+_listener: Optional[asyncio.Task] = None
+
+
+async def start_invalidation_listener() -> None:
+    """
+    Запускает прием инвалидаций из других воркеров, если настроен Redis
+    """
+    global _listener
+    if invalidation_bus is not None and _listener is None:
+        _listener = asyncio.create_task(invalidation_bus.listen())
+
+
+async def stop_invalidation_listener() -> None:
+    """
+    Останавливает прием инвалидаций
+    """
+    global _listener
+    if _listener is not None:
+        invalidation_bus.close()
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
+
+
+def film_key(film_id: int) -> str:
+    return f"film:{film_id}"
+
+
+def film_recommendations_key(film_id: int) -> str:
+    return f"film_recommendations:{film_id}"
+
+
+def top_films_key(genre: str, count: int) -> str:
+    return f"top_films:{genre}:{count}"
+
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def user_statuses_key(user_id: int, status: Optional[str] = None) -> str:
+    if status is None:
+        return f"user_statuses:{user_id}"
+    return f"user_statuses:{user_id}:{status}"
+
+
+def all_user_statuses_keys(user_id: int) -> List[str]:
+    """
+    Возвращает все ключи кэша со статусами пользователя - для инвалидации после изменения статуса
+    """
+    return [user_statuses_key(user_id)] + [user_statuses_key(user_id, status.name) for status in StatusEnum]
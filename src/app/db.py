@@ -1,224 +1,472 @@
+import os
+import asyncio
+import itertools
 from fastapi import Depends
-from typing import AsyncGenerator, Type
-from sqlalchemy import select, Sequence, and_
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, AsyncIterator, Optional, Tuple, Type
+from sqlalchemy import select, Sequence, and_, func, inspect, text
+from sqlalchemy.orm import joinedload
 from fastapi_users.db import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from src.config import DATABASE_URL
+from src.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    REPLICA_DATABASE_URLS,
+    DB_REPLICA_STICKINESS_SECONDS,
+    PROJECT_DIR
+)
+from src.app.cache import cache
 from src.app.schemas import StatusEnum, RatingEnum
-from src.app.models import Base, User, Film, Status
-from src.utils.exceptions import UserNotFound, FilmNotFound
+from src.app.models import Base, User, Film, Status, StatusEvent
+from src.app.repository import Repository
+from src.utils.exceptions import UserNotFound, FilmNotFound, SchemaVersionMismatch
 
 
-engine = create_async_engine(DATABASE_URL)
+engine = create_async_engine(DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                             pool_timeout=DB_POOL_TIMEOUT)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+# Реплики для чтения. Выбираются по кругу
+replica_engines = [
+    create_async_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    for url in REPLICA_DATABASE_URLS
+]
+replica_session_makers = [async_sessionmaker(replica, expire_on_commit=False) for replica in replica_engines]
+_replica_cycle = itertools.cycle(replica_session_makers)
 
-async def create_db_and_tables() -> None:
-    """
-    Создает БД и таблицы
-    """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
 
+def primary_sticky_key(user_id: int) -> str:
+    return f"primary_sticky:{user_id}"
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+
+async def get_read_session_maker(user_id: Optional[int] = None) -> async_sessionmaker:
     """
-    Генератор асинхронных сессий
+    Возвращает фабрику сессий для чтения: реплику, если они настроены.
+    Пользователь, недавно изменивший данные, читает из основной БД, чтобы увидеть свои изменения
+
+    :param user_id: id пользователя, чьи данные читаются
     """
-    async with async_session_maker() as session:
-        yield session
+    if not replica_session_makers:
+        return async_session_maker
 
+    if user_id is not None and await cache.get(primary_sticky_key(user_id)):
+        return async_session_maker
 
-async def get_user_db(session: AsyncSession = Depends(get_async_session)):
-    yield SQLAlchemyUserDatabase(session, User)
+    return next(_replica_cycle)
 
 
-async def db_get_user_by_id(user_id: int) -> Type[User]:
+async def stick_to_primary(user_id: int) -> None:
     """
-    Возвращает пользователя, найденного по user_id
+    Направляет чтения данных пользователя в основную БД на DB_REPLICA_STICKINESS_SECONDS секунд
 
     :param user_id: id пользователя
     """
-    async with async_session_maker() as session:
-        async with session.begin():
-            user = await session.get(User, user_id)
-            return user
+    if replica_session_makers:
+        await cache.set(primary_sticky_key(user_id), True, ttl=DB_REPLICA_STICKINESS_SECONDS)
 
 
-async def db_get_user_by_username(username: str) -> User:
+async def create_db_and_tables() -> None:
+    """
+    Создает БД и таблицы. Для рабочих БД используются миграции (alembic upgrade head)
     """
-    Возвращает пользователя, найденного по username
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
 
-    :param username: имя пользователя
+def get_head_schema_version() -> str:
     """
+    Возвращает последнюю версию схемы из миграций
+    """
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
 
-    async with async_session_maker() as session:
-        async with session.begin():
-            q = select(User).where(User.username == username)
-            users = await session.execute(q)
-            return users.scalars().first()
+    config = Config(os.path.join(PROJECT_DIR, 'alembic.ini'))
+    return ScriptDirectory.from_config(config).get_current_head()
 
 
-async def db_get_all_users() -> Sequence[User]:
+async def verify_schema_version() -> None:
     """
-    Возвращает всех пользователей сервиса
+    Проверяет, что к БД применены все миграции. Сама схема при запуске воркера не меняется
     """
+    expected = get_head_schema_version()
+    async with engine.connect() as conn:
+        has_version_table = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table('alembic_version'))
+        current = None
+        if has_version_table:
+            current = (await conn.execute(text('SELECT version_num FROM alembic_version'))).scalar()
 
-    async with async_session_maker() as session:
-        async with session.begin():
-            q = select(User)
-            users = await session.execute(q)
-            return users.scalars().all()
+    if current != expected:
+        raise SchemaVersionMismatch(
+            f'Database schema version is {current}, expected {expected}. Run "alembic upgrade head"'
+        )
 
 
-# Films
-async def db_get_film(film_id: int) -> Type[Film]:
+async def warm_up_connection_pool() -> None:
+    """
+    Открывает соединения пула основной БД и реплик заранее, до первых запросов
     """
-     Возвращает конкретный экземпляр класса Film, полученный по film_id.
 
-     :param film_id: id фильма
-     """
+    for pool_engine in [engine, *replica_engines]:
+        # Все соединения открыты одновременно, поэтому пул создает DB_POOL_SIZE разных соединений
+        connections = await asyncio.gather(*(pool_engine.connect().start() for _ in range(DB_POOL_SIZE)))
+        try:
+            await asyncio.gather(*(conn.execute(text('SELECT 1')) for conn in connections))
+        finally:
+            await asyncio.gather(*(conn.close() for conn in connections))
 
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Генератор асинхронных сессий
+    """
     async with async_session_maker() as session:
-        async with session.begin():
-            film = await session.get(Film, film_id)
+        yield session
+
 
-            if film:
-                return film
-            else:
-                raise FilmNotFound
+async def get_user_db(session: AsyncSession = Depends(get_async_session)):
+    yield SQLAlchemyUserDatabase(session, User)
 
 
-async def db_get_top_films_by_genre(genre: str, count: int) -> Sequence[Film]:
+class SQLAlchemyRepository(Repository):
     """
-    Возвращает список размера count сущностей класса Film, в выбранном жанре.
-    Фильмы отсортированы по рейтингу IMDB от лучших к худшим
-
-    :param genre: жанр фильма
-    :param count: количество фильмов, которое нужно вернуть
+    Слой данных поверх PostgreSQL. Каждый метод открывает свою сессию;
+    чтения идут через get_read_session_maker (реплики), записи - в основную БД
     """
 
-    async with async_session_maker() as session:
-        async with session.begin():
-            q = select(Film).where(Film.genres.contains([genre])).order_by(Film.rating_imdb.desc()).limit(count)
-            films = await session.execute(q)
-            return films.scalars().all()
+    async def get_user_by_id(self, user_id: int) -> Type[User]:
+        async with async_session_maker() as session:
+            async with session.begin():
+                user = await session.get(User, user_id)
+                return user
+
+    async def get_user_by_username(self, username: str) -> User:
+        async with async_session_maker() as session:
+            async with session.begin():
+                q = select(User).where(User.username == username)
+                users = await session.execute(q)
+                return users.scalars().first()
+
+    async def get_all_users(self) -> Sequence[User]:
+        async with async_session_maker() as session:
+            async with session.begin():
+                q = select(User)
+                users = await session.execute(q)
+                return users.scalars().all()
+
+    async def get_film(self, film_id: int) -> Type[Film]:
+        read_session_maker = await get_read_session_maker()
+        async with read_session_maker() as session:
+            async with session.begin():
+                film = await session.get(Film, film_id)
+
+                if film:
+                    return film
+                else:
+                    raise FilmNotFound
+
+    async def get_top_films_by_genre(self, genre: str, count: int) -> Sequence[Film]:
+        read_session_maker = await get_read_session_maker()
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = select(Film).where(Film.genres.contains([genre])).order_by(Film.rating_imdb.desc()).limit(count)
+                films = await session.execute(q)
+                return films.scalars().all()
+
+    async def get_genres(self) -> Sequence[str]:
+        read_session_maker = await get_read_session_maker()
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = select(func.unnest(Film.genres)).distinct()
+                genres = await session.execute(q)
+                return genres.scalars().all()
+
+    async def get_film_recommendations(self, film_id: int) -> Sequence[Film]:
+        read_session_maker = await get_read_session_maker()
+        async with read_session_maker() as session:
+            async with session.begin():
+
+                film = await self.get_film(film_id)
+                close_ids = film.close_film_ids
+
+                close_films_q = select(Film).where(Film.kinopoisk_id.in_(close_ids))
+                films = await session.execute(close_films_q)
+                return films.scalars().all()
+
+    async def get_films_last_modified(self, settle_seconds: float) -> Optional[datetime]:
+        read_session_maker = await get_read_session_maker()
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = select(func.max(Film.updated_at)).where(
+                    Film.updated_at < func.now() - timedelta(seconds=settle_seconds)
+                )
+                last_modified = await session.execute(q)
+                return last_modified.scalar()
+
+    async def stream_films(self, modified_since: Optional[datetime], batch_size: int,
+                           settle_seconds: float) -> AsyncGenerator[Sequence[Film], None]:
+        read_session_maker = await get_read_session_maker()
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = (
+                    select(Film)
+                    .where(Film.updated_at < func.now() - timedelta(seconds=settle_seconds))
+                    .order_by(Film.kinopoisk_id)
+                    .execution_options(yield_per=batch_size)
+                )
+                if modified_since is not None:
+                    q = q.where(Film.updated_at > modified_since)
+                films = await session.stream_scalars(q)
+                async for batch in films.partitions():
+                    yield batch
+
+    async def get_film_status(self, user_id: int, film_id: int) -> Status:
+        read_session_maker = await get_read_session_maker(user_id)
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = select(Status).where(and_(Status.user_id == user_id, Status.film_id == film_id))
+                status = await session.execute(q)
+                return status.scalars().first()
+
+    async def get_user_statuses(self, user_id: int, check_user: bool = True) -> Sequence[Status]:
+        read_session_maker = await get_read_session_maker(user_id)
+        async with read_session_maker() as session:
+            async with session.begin():
+
+                # Проверяем, что существует пользователь
+                if check_user:
+                    user = await self.get_user_by_id(user_id)
+                    if not user:
+                        raise UserNotFound
+
+                q = select(Status).where(Status.user_id == user_id)
+                status = await session.execute(q)
+                return status.scalars().all()
+
+    async def get_user_statuses_by_status(self, user_id: int, status: StatusEnum,
+                                          check_user: bool = True) -> Sequence[Status]:
+        read_session_maker = await get_read_session_maker(user_id)
+        async with read_session_maker() as session:
+            async with session.begin():
+
+                # Проверяем, что существует пользователь
+                if check_user:
+                    user = await self.get_user_by_id(user_id)
+                    if not user:
+                        raise UserNotFound
+
+                q = select(Status).where(and_(Status.user_id == user_id, Status.status == status))
+                status = await session.execute(q)
+                return status.scalars().all()
+
+    async def get_user_watchlist(self, user_id: int, status: Optional[StatusEnum], limit: int,
+                                 offset: int) -> Tuple[Sequence[Status], int]:
+        read_session_maker = await get_read_session_maker(user_id)
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = (
+                    select(Status, func.count().over().label('total'))
+                    .options(joinedload(Status.film).load_only(Film.name, Film.year, Film.genres,
+                                                               Film.rating_imdb, Film.film_length))
+                    .where(Status.user_id == user_id)
+                    .order_by(Status.updated_at.desc(), Status.id.desc())
+                    .limit(limit)
+                    .offset(offset)
+                )
+                if status is not None:
+                    q = q.where(Status.status == status)
+
+                rows = (await session.execute(q)).all()
+                if rows:
+                    return [row.Status for row in rows], rows[0].total
+                if not offset:
+                    return [], 0
+
+                # Страница за пределами списка: оконная функция не вернула строк, считаем отдельно
+                count_q = select(func.count()).select_from(Status).where(Status.user_id == user_id)
+                if status is not None:
+                    count_q = count_q.where(Status.status == status)
+                return [], (await session.execute(count_q)).scalar_one()
+
+    async def get_user_statuses_last_modified(self, user_id: int, settle_seconds: float) -> Optional[datetime]:
+        read_session_maker = await get_read_session_maker(user_id)
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = select(func.max(Status.updated_at)).where(and_(
+                    Status.user_id == user_id,
+                    Status.updated_at < func.now() - timedelta(seconds=settle_seconds)
+                ))
+                last_modified = await session.execute(q)
+                return last_modified.scalar()
+
+    async def stream_user_statuses(self, user_id: int, modified_since: Optional[datetime], batch_size: int,
+                                   settle_seconds: float) -> AsyncGenerator[Sequence[Status], None]:
+        read_session_maker = await get_read_session_maker(user_id)
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = (
+                    select(Status)
+                    .where(and_(Status.user_id == user_id,
+                                Status.updated_at < func.now() - timedelta(seconds=settle_seconds)))
+                    .order_by(Status.id)
+                    .execution_options(yield_per=batch_size)
+                )
+                if modified_since is not None:
+                    q = q.where(Status.updated_at > modified_since)
+                statuses = await session.stream_scalars(q)
+                async for batch in statuses.partitions():
+                    yield batch
+
+    async def create_or_update_status(self, user_id: int, film_id: int, status: StatusEnum, rating: RatingEnum,
+                                      check_user: bool = True) -> Status:
+        async with async_session_maker() as session:
+            async with session.begin():
+
+                # Пользователя и фильм проверяем в той же транзакции основной БД: запись не зависит от реплик
+                if check_user:
+                    user = await session.get(User, user_id)
+                    if not user:
+                        raise UserNotFound
+
+                film = await session.get(Film, film_id)
+                if not film:
+                    raise FilmNotFound
+
+                # Текущий статус читаем в той же транзакции основной БД, а не с реплики
+                q = select(Status).where(and_(Status.user_id == user_id, Status.film_id == film_id))
+                film_status = (await session.execute(q)).scalars().first()
+                if film_status:
+                    previous_status, previous_rating = film_status.status, film_status.rating
+                    film_status.status = status
+                    film_status.rating = rating
+                else:
+                    previous_status, previous_rating = None, None
+                    film_status = Status(
+                        user_id=user_id,
+                        film_id=film_id,
+                        status=status,
+                        rating=rating
+                    )
+                    session.add(film_status)
+                    # Нужен id нового статуса для события
+                    await session.flush()
+
+                session.add(StatusEvent(
+                    status_id=film_status.id,
+                    user_id=user_id,
+                    film_id=film_id,
+                    status=status,
+                    rating=rating,
+                    previous_status=previous_status,
+                    previous_rating=previous_rating
+                ))
+
+            await stick_to_primary(user_id)
+            return film_status
+
+    async def stream_status_events(self, after_id: int, batch_size: int,
+                                   settle_seconds: float) -> AsyncGenerator[Sequence[StatusEvent], None]:
+        read_session_maker = await get_read_session_maker()
+        async with read_session_maker() as session:
+            async with session.begin():
+                q = (
+                    select(StatusEvent)
+                    .where(and_(StatusEvent.id > after_id,
+                                StatusEvent.created_at < func.now() - timedelta(seconds=settle_seconds)))
+                    .order_by(StatusEvent.id)
+                    .execution_options(yield_per=batch_size)
+                )
+                events = await session.stream_scalars(q)
+                async for batch in events.partitions():
+                    yield batch
 
 
-async def db_get_film_recommendations(film_id: int) -> Sequence[Film]:
+repository: Repository = SQLAlchemyRepository()
+
+
+def set_repository(new_repository: Repository) -> None:
     """
-    Возвращает список рекомендованных фильмов в виде экземпляров класса Film
+    Подменяет слой данных, через который работают функции db_* (например, на InMemoryRepository)
 
-    :param film_id: id фильма, для которого нужны рекомендации
+    :param new_repository: новый слой данных
     """
+    global repository
+    repository = new_repository
 
-    async with async_session_maker() as session:
-        async with session.begin():
 
-            film = await db_get_film(film_id)
-            close_ids = film.close_film_ids
+# Функции db_* делегируют текущему слою данных. Описание - в src.app.repository.Repository
 
-            close_films_q = select(Film).where(Film.kinopoisk_id.in_(close_ids))
-            films = await session.execute(close_films_q)
-            return films.scalars().all()
+async def db_get_user_by_id(user_id: int) -> Optional[User]:
+    return await repository.get_user_by_id(user_id)
 
 
-async def db_get_film_status(user_id: int, film_id: int) -> Status:
-    """
-    Возвращает статус и рейтинг, который поставил пользователь конкретному фильму
+async def db_get_user_by_username(username: str) -> Optional[User]:
+    return await repository.get_user_by_username(username)
 
-    :param user_id: id пользователя
-    :param film_id: id фильма
-    """
 
-    async with async_session_maker() as session:
-        async with session.begin():
-            q = select(Status).where(and_(Status.user_id == user_id, Status.film_id == film_id))
-            status = await session.execute(q)
-            return status.scalars().first()
+async def db_get_all_users() -> Sequence[User]:
+    return await repository.get_all_users()
 
 
-async def db_get_user_statuses(user_id: int) -> Sequence[Status]:
-    """
-    Возвращает статусы и рейтинги, который поставил пользователь фильмам
+async def db_get_film(film_id: int) -> Film:
+    return await repository.get_film(film_id)
 
-    :param user_id: id пользователя
-    """
 
-    async with async_session_maker() as session:
-        async with session.begin():
+async def db_get_top_films_by_genre(genre: str, count: int) -> Sequence[Film]:
+    return await repository.get_top_films_by_genre(genre, count)
 
-            # Проверяем, что существует пользователь
-            user = await db_get_user_by_id(user_id)
-            if not user:
-                raise UserNotFound
 
-            q = select(Status).where(Status.user_id == user_id)
-            status = await session.execute(q)
-            return status.scalars().all()
+async def db_get_genres() -> Sequence[str]:
+    return await repository.get_genres()
 
 
-async def db_get_user_statuses_by_status(user_id: int, status: StatusEnum) -> Sequence[Status]:
-    """
-    Возвращает статусы и рейтинги, который поставил пользователь фильмам с фильтром по статусу
+async def db_get_film_recommendations(film_id: int) -> Sequence[Film]:
+    return await repository.get_film_recommendations(film_id)
 
-    :param user_id: id пользователя
-    :param status: статус
-    """
 
-    async with async_session_maker() as session:
-        async with session.begin():
+async def db_get_films_last_modified(settle_seconds: float) -> Optional[datetime]:
+    return await repository.get_films_last_modified(settle_seconds)
 
-            # Проверяем, что существует пользователь
-            user = await db_get_user_by_id(user_id)
-            if not user:
-                raise UserNotFound
 
-            q = select(Status).where(and_(Status.user_id == user_id, Status.status == status))
-            status = await session.execute(q)
-            return status.scalars().all()
+def db_stream_films(modified_since: Optional[datetime], batch_size: int,
+                    settle_seconds: float) -> AsyncIterator[Sequence[Film]]:
+    return repository.stream_films(modified_since, batch_size, settle_seconds)
 
 
-async def db_create_or_update_status(user_id: int, film_id: int, status: StatusEnum, rating: RatingEnum) -> Status:
-    """
-    Создает и возвращает статус и рейтинг, который поставил пользователь конкретному фильму
+async def db_get_film_status(user_id: int, film_id: int) -> Optional[Status]:
+    return await repository.get_film_status(user_id, film_id)
 
-    :param user_id: id пользователя
-    :param film_id: id пользователя
-    :param status: пользовательский статус фильма
-    :param rating: пользовательский рейтинг фильма
-    """
 
-    async with async_session_maker() as session:
-        async with session.begin():
-
-            # Проверяем, что существует пользователь
-            user = await db_get_user_by_id(user_id)
-            if not user:
-                raise UserNotFound
-
-            # Проверяем, что существует фильм
-            film = await db_get_film(film_id)
-            if not film:
-                raise FilmNotFound
-
-            film_status = await db_get_film_status(user_id, film_id)
-            if film_status:
-                film_status.status = status
-                film_status.rating = rating
-                session.add(film_status)
-                await session.commit()
-                return film_status
-
-            else:
-                film_status = Status(
-                    user_id=user_id,
-                    film_id=film_id,
-                    status=status,
-                    rating=rating
-                )
-                session.add(film_status)
-                await session.commit()
-                return film_status
+async def db_get_user_statuses(user_id: int, check_user: bool = True) -> Sequence[Status]:
+    return await repository.get_user_statuses(user_id, check_user)
+
+
+async def db_get_user_statuses_by_status(user_id: int, status: StatusEnum,
+                                         check_user: bool = True) -> Sequence[Status]:
+    return await repository.get_user_statuses_by_status(user_id, status, check_user)
+
+
+async def db_get_user_watchlist(user_id: int, status: Optional[StatusEnum], limit: int,
+                                offset: int) -> Tuple[Sequence[Status], int]:
+    return await repository.get_user_watchlist(user_id, status, limit, offset)
+
+
+async def db_get_user_statuses_last_modified(user_id: int, settle_seconds: float) -> Optional[datetime]:
+    return await repository.get_user_statuses_last_modified(user_id, settle_seconds)
+
+
+def db_stream_user_statuses(user_id: int, modified_since: Optional[datetime], batch_size: int,
+                            settle_seconds: float) -> AsyncIterator[Sequence[Status]]:
+    return repository.stream_user_statuses(user_id, modified_since, batch_size, settle_seconds)
+
+
+async def db_create_or_update_status(user_id: int, film_id: int, status: StatusEnum, rating: RatingEnum,
+                                     check_user: bool = True) -> Status:
+    return await repository.create_or_update_status(user_id, film_id, status, rating, check_user)
+
 
+def db_stream_status_events(after_id: int, batch_size: int,
+                            settle_seconds: float) -> AsyncIterator[Sequence[StatusEvent]]:
+    return repository.stream_status_events(after_id, batch_size, settle_seconds)
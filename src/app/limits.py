@@ -0,0 +1,56 @@
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+
+from src.app.models import User
+from src.app.users import current_optional_user
+from src.config import RATE_LIMITS, RATE_LIMIT_DEFAULT, MAX_CONCURRENT_REQUESTS
+from src.utils.rate_limit import ConcurrencyLimiter, RateLimiter, parse_limit
+
+
+rate_limiter = RateLimiter(
+    limits={
+        route: parse_limit(limit)
+        for route, limit in (item.split('=') for item in RATE_LIMITS.split(',') if item.strip())
+    },
+    default=parse_limit(RATE_LIMIT_DEFAULT) if RATE_LIMIT_DEFAULT else None,
+)
+
+concurrency_limiter = ConcurrencyLimiter(MAX_CONCURRENT_REQUESTS)
+
+
+def disable_rate_limits() -> None:
+    """
+    Снимает лимиты частоты запросов в текущем процессе. Для бенчмарков и тестов,
+    которые шлют много запросов от одного клиента
+    """
+    rate_limiter.limits = {}
+    rate_limiter.default = None
+
+
+async def rate_limit(request: Request, user: Optional[User] = Depends(current_optional_user)) -> None:
+    """
+    Зависимость роутеров: ограничивает частоту запросов к маршруту для пользователя из токена,
+    а для анонимных запросов - для IP клиента. За прокси IP клиента берется из X-Forwarded-For,
+    только если адрес прокси указан в --forwarded-allow-ips uvicorn
+
+    :param request: запрос
+    :param user: экземпляр модели User из токена или None
+    """
+    route = request.scope['route'].name
+    key = f"user:{user.id}" if user else f"ip:{request.client.host if request.client else None}"
+
+    retry_after = rate_limiter.check(route, key)
+    if retry_after:
+        raise HTTPException(status_code=429,
+                            detail="Too many requests",
+                            headers={"Retry-After": str(max(1, round(retry_after)))})
+
+
+def get_limits_stats() -> dict:
+    """
+    Возвращает счетчики ограничений для мониторинга
+    """
+    return {
+        'concurrency': concurrency_limiter.stats(),
+        'rate_limits': dict(rate_limiter.counters),
+    }
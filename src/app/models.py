@@ -12,7 +12,8 @@ from sqlalchemy import (
     Integer,
     Float,
     ForeignKey,
-    Enum
+    Enum,
+    Index
 )
 
 from src.app.schemas import StatusEnum, RatingEnum
@@ -57,6 +58,11 @@ class Film(Base):
     """
 
     __tablename__ = "films"
+    __table_args__ = (
+        Index("ix_films_genres", "genres", postgresql_using="gin"),
+        Index("ix_films_rating_imdb", "rating_imdb"),
+        Index("ix_films_updated_at", "updated_at"),
+    )
 
     kinopoisk_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     name: Mapped[str] = mapped_column(String(256), nullable=False)
@@ -67,6 +73,9 @@ class Film(Base):
     year: Mapped[int] = mapped_column(Integer)
     film_length: Mapped[int] = mapped_column(Integer, nullable=True)
     close_film_ids: Mapped[list] = mapped_column(ARRAY(Integer), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
     # Relationships
     status: Mapped["Status"] = relationship(back_populates="film")
@@ -85,10 +94,18 @@ class Status(Base):
     """
 
     __tablename__ = "statuses"
+    __table_args__ = (
+        Index("ix_statuses_user_id_film_id", "user_id", "film_id"),
+    )
+    # updated_at вычисляется в БД: забираем его через RETURNING, чтобы им можно было пользоваться вне сессии
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     status: Mapped[StatusEnum] = mapped_column(Enum(StatusEnum), nullable=True)
     rating: Mapped[RatingEnum] = mapped_column(Enum(RatingEnum), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
     # Relationships
     film_id: Mapped[int] = mapped_column(ForeignKey("films.kinopoisk_id"))
@@ -96,3 +113,31 @@ class Status(Base):
 
     user_id: Mapped[List[User]] = mapped_column(ForeignKey("users.id"))
     user: Mapped["User"] = relationship(back_populates="statuses")
+
+
+class StatusEvent(Base):
+    """
+    Событие изменения статуса или рейтинга фильма пользователем (transactional outbox).
+    Записывается в одной транзакции с изменением статуса и никогда не изменяется
+    """
+
+    __tablename__ = "status_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    status_id: Mapped[int] = mapped_column(ForeignKey("statuses.id"))
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    film_id: Mapped[int] = mapped_column(BigInteger)
+    status: Mapped[StatusEnum] = mapped_column(Enum(StatusEnum), nullable=True)
+    rating: Mapped[RatingEnum] = mapped_column(Enum(RatingEnum), nullable=True)
+    previous_status: Mapped[StatusEnum] = mapped_column(Enum(StatusEnum), nullable=True)
+    previous_rating: Mapped[RatingEnum] = mapped_column(Enum(RatingEnum), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    def __repr__(self):
+        return "StatusEvent(id=%s, status_id=%s, created_at='%s')" % (
+            self.id,
+            self.status_id,
+            self.created_at,
+        )
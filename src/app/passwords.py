@@ -0,0 +1,52 @@
+import asyncio
+from functools import cached_property
+from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+from pwdlib.hashers.bcrypt import BcryptHasher
+from fastapi_users.password import PasswordHelper
+
+from src.config import PASSWORD_HASH_ROUNDS, PASSWORD_HASH_WORKERS
+
+# bcrypt учитывает только первые 72 байта пароля
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+
+class PoolPasswordHelper(PasswordHelper):
+    """
+    Хэширование паролей bcrypt в ограниченном пуле потоков, чтобы не блокировать event loop.
+    Хэши с другой стоимостью (или argon2) проходят проверку и помечаются на перехэширование.
+    Пул потоков создается при первом хэшировании
+    """
+
+    def __init__(self, rounds: int, max_workers: int):
+        super().__init__(PasswordHash((BcryptHasher(rounds=rounds), Argon2Hasher())))
+        self.max_workers = max_workers
+
+    @cached_property
+    def executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+
+    async def hash_async(self, password: str) -> str:
+        """
+        Возвращает хэш пароля, посчитанный в пуле
+
+        :param password: пароль
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.hash, password)
+
+    async def verify_and_update_async(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Проверяет пароль в пуле. Вторым элементом возвращает новый хэш, если стоимость изменилась
+
+        :param plain_password: пароль
+        :param hashed_password: сохраненный хэш
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.verify_and_update, plain_password, hashed_password)
+
+
+password_helper = PoolPasswordHelper(rounds=PASSWORD_HASH_ROUNDS, max_workers=PASSWORD_HASH_WORKERS)
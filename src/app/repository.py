@@ -0,0 +1,413 @@
+import itertools
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+from fastapi_users.db import BaseUserDatabase
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.app.schemas import StatusEnum, RatingEnum
+from src.app.models import User, Film, Status, StatusEvent
+from src.utils.exceptions import UserNotFound, FilmNotFound
+
+
+class Repository(ABC):
+    """
+    Интерфейс слоя данных, которым пользуются функции db_* из src.app.db
+    """
+
+    @abstractmethod
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+        """
+        Возвращает пользователя, найденного по user_id
+
+        :param user_id: id пользователя
+        """
+
+    @abstractmethod
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        """
+        Возвращает пользователя, найденного по username
+
+        :param username: имя пользователя
+        """
+
+    @abstractmethod
+    async def get_all_users(self) -> Sequence[User]:
+        """
+        Возвращает всех пользователей сервиса
+        """
+
+    @abstractmethod
+    async def get_film(self, film_id: int) -> Film:
+        """
+        Возвращает конкретный экземпляр класса Film, полученный по film_id.
+        Если фильма нет, выбрасывает FilmNotFound
+
+        :param film_id: id фильма
+        """
+
+    @abstractmethod
+    async def get_top_films_by_genre(self, genre: str, count: int) -> Sequence[Film]:
+        """
+        Возвращает список размера count сущностей класса Film, в выбранном жанре.
+        Фильмы отсортированы по рейтингу IMDB от лучших к худшим
+
+        :param genre: жанр фильма
+        :param count: количество фильмов, которое нужно вернуть
+        """
+
+    @abstractmethod
+    async def get_genres(self) -> Sequence[str]:
+        """
+        Возвращает все жанры фильмов
+        """
+
+    @abstractmethod
+    async def get_film_recommendations(self, film_id: int) -> Sequence[Film]:
+        """
+        Возвращает список рекомендованных фильмов в виде экземпляров класса Film
+
+        :param film_id: id фильма, для которого нужны рекомендации
+        """
+
+    @abstractmethod
+    async def get_films_last_modified(self, settle_seconds: float) -> Optional[datetime]:
+        """
+        Возвращает время последнего изменения каталога фильмов без учета изменений моложе settle_seconds
+
+        :param settle_seconds: минимальный возраст учитываемых изменений в секундах
+        """
+
+    @abstractmethod
+    def stream_films(self, modified_since: Optional[datetime], batch_size: int,
+                     settle_seconds: float) -> AsyncIterator[Sequence[Film]]:
+        """
+        Отдает пачками по batch_size фильмы, измененные после modified_since (или все), по возрастанию id.
+        В памяти одновременно только одна пачка. Фильмы, измененные меньше settle_seconds назад,
+        пропускаются: updated_at - время начала транзакции, и более ранние транзакции могли еще не завершиться
+
+        :param modified_since: время предыдущей выгрузки
+        :param batch_size: размер пачки
+        :param settle_seconds: минимальный возраст выгружаемых изменений в секундах
+        """
+
+    @abstractmethod
+    async def get_film_status(self, user_id: int, film_id: int) -> Optional[Status]:
+        """
+        Возвращает статус и рейтинг, который поставил пользователь конкретному фильму
+
+        :param user_id: id пользователя
+        :param film_id: id фильма
+        """
+
+    @abstractmethod
+    async def get_user_statuses(self, user_id: int, check_user: bool = True) -> Sequence[Status]:
+        """
+        Возвращает статусы и рейтинги, который поставил пользователь фильмам
+
+        :param user_id: id пользователя
+        :param check_user: проверять ли существование пользователя (не нужно, если id взят из токена)
+        """
+
+    @abstractmethod
+    async def get_user_statuses_by_status(self, user_id: int, status: StatusEnum,
+                                          check_user: bool = True) -> Sequence[Status]:
+        """
+        Возвращает статусы и рейтинги, который поставил пользователь фильмам с фильтром по статусу
+
+        :param user_id: id пользователя
+        :param status: статус
+        :param check_user: проверять ли существование пользователя (не нужно, если id взят из токена)
+        """
+
+    @abstractmethod
+    async def get_user_watchlist(self, user_id: int, status: Optional[StatusEnum], limit: int,
+                                 offset: int) -> Tuple[Sequence[Status], int]:
+        """
+        Возвращает страницу статусов пользователя вместе с фильмами (Status.film загружен)
+        и общее количество статусов с учетом фильтра (в том числе для страницы за пределами списка).
+        Сначала идут недавно измененные
+
+        :param user_id: id пользователя
+        :param status: фильтр по статусу, None - все статусы
+        :param limit: размер страницы
+        :param offset: смещение от начала списка
+        """
+
+    @abstractmethod
+    async def get_user_statuses_last_modified(self, user_id: int, settle_seconds: float) -> Optional[datetime]:
+        """
+        Возвращает время последнего изменения статусов пользователя без учета изменений моложе settle_seconds
+
+        :param user_id: id пользователя
+        :param settle_seconds: минимальный возраст учитываемых изменений в секундах
+        """
+
+    @abstractmethod
+    def stream_user_statuses(self, user_id: int, modified_since: Optional[datetime], batch_size: int,
+                             settle_seconds: float) -> AsyncIterator[Sequence[Status]]:
+        """
+        Отдает пачками по batch_size статусы пользователя, измененные после modified_since (или все).
+        В памяти одновременно только одна пачка. Статусы, измененные меньше settle_seconds назад, пропускаются
+
+        :param user_id: id пользователя
+        :param modified_since: время предыдущей выгрузки
+        :param batch_size: размер пачки
+        :param settle_seconds: минимальный возраст выгружаемых изменений в секундах
+        """
+
+    @abstractmethod
+    async def create_or_update_status(self, user_id: int, film_id: int, status: StatusEnum, rating: RatingEnum,
+                                      check_user: bool = True) -> Status:
+        """
+        Создает и возвращает статус и рейтинг, который поставил пользователь конкретному фильму.
+        Вместе с ним атомарно записывает событие изменения (StatusEvent)
+
+        :param user_id: id пользователя
+        :param film_id: id фильма
+        :param status: пользовательский статус фильма
+        :param rating: пользовательский рейтинг фильма
+        :param check_user: проверять ли существование пользователя (не нужно, если id взят из токена)
+        """
+
+    @abstractmethod
+    def stream_status_events(self, after_id: int, batch_size: int,
+                             settle_seconds: float) -> AsyncIterator[Sequence[StatusEvent]]:
+        """
+        Отдает пачками по batch_size события изменения статусов с id больше after_id, по возрастанию id.
+        События моложе settle_seconds пропускаются: транзакции с меньшими id могли еще не завершиться
+
+        :param after_id: id последнего уже выгруженного события
+        :param batch_size: размер пачки
+        :param settle_seconds: минимальный возраст выгружаемых событий в секундах
+        """
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _batches(items: List[Any], batch_size: int) -> List[Sequence[Any]]:
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+class InMemoryRepository(Repository):
+    """
+    Слой данных в памяти процесса: словари и индексы вместо БД.
+    Для модульных тестов и замеров накладных расходов API без времени БД
+    """
+
+    def __init__(self):
+        self.users: Dict[int, User] = {}
+        self.films: Dict[int, Film] = {}
+        self.statuses: Dict[int, Status] = {}
+        self.events: List[StatusEvent] = []
+
+        # Индексы
+        self.films_by_genre: Dict[str, Set[int]] = defaultdict(set)
+        self.status_by_user_film: Dict[Tuple[int, int], int] = {}
+        self.statuses_by_user: Dict[int, List[int]] = defaultdict(list)
+
+        self._user_ids = itertools.count(1)
+        self._status_ids = itertools.count(1)
+        self._event_ids = itertools.count(1)
+
+    def add_user(self, user: User) -> User:
+        """
+        Добавляет пользователя. Если id не задан, присваивает следующий
+
+        :param user: экземпляр модели User
+        """
+        if user.id is None:
+            user.id = next(self._user_ids)
+        if user.created_at is None:
+            user.created_at = _now()
+        self.users[user.id] = user
+        return user
+
+    def add_film(self, film: Film) -> Film:
+        """
+        Добавляет фильм в каталог
+
+        :param film: экземпляр модели Film
+        """
+        if film.updated_at is None:
+            film.updated_at = _now()
+        self.films[film.kinopoisk_id] = film
+        for genre in film.genres or []:
+            self.films_by_genre[genre].add(film.kinopoisk_id)
+        return film
+
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+        return self.users.get(user_id)
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        return next((user for user in self.users.values() if user.username == username), None)
+
+    async def get_all_users(self) -> Sequence[User]:
+        return list(self.users.values())
+
+    async def get_film(self, film_id: int) -> Film:
+        film = self.films.get(film_id)
+        if film:
+            return film
+        else:
+            raise FilmNotFound
+
+    async def get_top_films_by_genre(self, genre: str, count: int) -> Sequence[Film]:
+        films = [self.films[film_id] for film_id in self.films_by_genre.get(genre, ())]
+        # Как в Postgres при ORDER BY ... DESC: фильмы без рейтинга идут первыми
+        films.sort(key=lambda film: (film.rating_imdb is None, film.rating_imdb or 0), reverse=True)
+        return films[:count]
+
+    async def get_genres(self) -> Sequence[str]:
+        return [genre for genre, film_ids in self.films_by_genre.items() if film_ids]
+
+    async def get_film_recommendations(self, film_id: int) -> Sequence[Film]:
+        film = await self.get_film(film_id)
+        return [self.films[close_id] for close_id in film.close_film_ids or [] if close_id in self.films]
+
+    async def get_films_last_modified(self, settle_seconds: float) -> Optional[datetime]:
+        settled = _now() - timedelta(seconds=settle_seconds)
+        return max((film.updated_at for film in self.films.values() if film.updated_at < settled), default=None)
+
+    async def stream_films(self, modified_since: Optional[datetime], batch_size: int,
+                           settle_seconds: float) -> AsyncIterator[Sequence[Film]]:
+        settled = _now() - timedelta(seconds=settle_seconds)
+        films = [film for _, film in sorted(self.films.items())
+                 if film.updated_at < settled and (modified_since is None or film.updated_at > modified_since)]
+        for batch in _batches(films, batch_size):
+            yield batch
+
+    async def _check_user(self, user_id: int) -> None:
+        if user_id not in self.users:
+            raise UserNotFound
+
+    def _user_statuses(self, user_id: int) -> List[Status]:
+        return [self.statuses[status_id] for status_id in self.statuses_by_user.get(user_id, ())]
+
+    async def get_film_status(self, user_id: int, film_id: int) -> Optional[Status]:
+        status_id = self.status_by_user_film.get((user_id, film_id))
+        return self.statuses[status_id] if status_id is not None else None
+
+    async def get_user_statuses(self, user_id: int, check_user: bool = True) -> Sequence[Status]:
+        if check_user:
+            await self._check_user(user_id)
+        return self._user_statuses(user_id)
+
+    async def get_user_statuses_by_status(self, user_id: int, status: StatusEnum,
+                                          check_user: bool = True) -> Sequence[Status]:
+        if check_user:
+            await self._check_user(user_id)
+        return [film_status for film_status in self._user_statuses(user_id) if film_status.status == status]
+
+    async def get_user_watchlist(self, user_id: int, status: Optional[StatusEnum], limit: int,
+                                 offset: int) -> Tuple[Sequence[Status], int]:
+        statuses = [film_status for film_status in self._user_statuses(user_id)
+                    if status is None or film_status.status == status]
+        statuses.sort(key=lambda film_status: (film_status.updated_at, film_status.id), reverse=True)
+        page = statuses[offset:offset + limit]
+
+        # Копии с загруженным фильмом: у хранимых статусов связь не заполняется,
+        # иначе она попала бы в ответы остальных эндпоинтов
+        items = []
+        for film_status in page:
+            item = Status(**{column.key: getattr(film_status, column.key) for column in Status.__table__.columns})
+            set_committed_value(item, 'film', self.films.get(film_status.film_id))
+            items.append(item)
+        return items, len(statuses)
+
+    async def get_user_statuses_last_modified(self, user_id: int, settle_seconds: float) -> Optional[datetime]:
+        settled = _now() - timedelta(seconds=settle_seconds)
+        return max((film_status.updated_at for film_status in self._user_statuses(user_id)
+                    if film_status.updated_at < settled), default=None)
+
+    async def stream_user_statuses(self, user_id: int, modified_since: Optional[datetime], batch_size: int,
+                                   settle_seconds: float) -> AsyncIterator[Sequence[Status]]:
+        settled = _now() - timedelta(seconds=settle_seconds)
+        statuses = [film_status for film_status in self._user_statuses(user_id)
+                    if film_status.updated_at < settled
+                    and (modified_since is None or film_status.updated_at > modified_since)]
+        for batch in _batches(statuses, batch_size):
+            yield batch
+
+    async def create_or_update_status(self, user_id: int, film_id: int, status: StatusEnum, rating: RatingEnum,
+                                      check_user: bool = True) -> Status:
+        if check_user:
+            await self._check_user(user_id)
+        await self.get_film(film_id)
+
+        film_status = await self.get_film_status(user_id, film_id)
+        if film_status:
+            previous_status, previous_rating = film_status.status, film_status.rating
+            film_status.status = status
+            film_status.rating = rating
+            film_status.updated_at = _now()
+        else:
+            previous_status, previous_rating = None, None
+            film_status = Status(
+                id=next(self._status_ids),
+                user_id=user_id,
+                film_id=film_id,
+                status=status,
+                rating=rating,
+                updated_at=_now()
+            )
+            self.statuses[film_status.id] = film_status
+            self.status_by_user_film[(user_id, film_id)] = film_status.id
+            self.statuses_by_user[user_id].append(film_status.id)
+
+        self.events.append(StatusEvent(
+            id=next(self._event_ids),
+            status_id=film_status.id,
+            user_id=user_id,
+            film_id=film_id,
+            status=status,
+            rating=rating,
+            previous_status=previous_status,
+            previous_rating=previous_rating,
+            created_at=_now()
+        ))
+        return film_status
+
+    async def stream_status_events(self, after_id: int, batch_size: int,
+                                   settle_seconds: float) -> AsyncIterator[Sequence[StatusEvent]]:
+        settled = _now() - timedelta(seconds=settle_seconds)
+        events = [event for event in self.events if event.id > after_id and event.created_at < settled]
+        for batch in _batches(events, batch_size):
+            yield batch
+
+
+class InMemoryUserDatabase(BaseUserDatabase[User, int]):
+    """
+    Хранилище пользователей fastapi-users поверх InMemoryRepository.
+    Подставляется вместо get_user_db, чтобы регистрация и вход работали без БД
+
+    :param repository: репозиторий с пользователями
+    """
+
+    def __init__(self, repository: InMemoryRepository):
+        self.repository = repository
+
+    async def get(self, id: int) -> Optional[User]:
+        return self.repository.users.get(id)
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        email = email.lower()
+        return next((user for user in self.repository.users.values() if user.email.lower() == email), None)
+
+    async def create(self, create_dict: Dict[str, Any]) -> User:
+        user = User(is_active=True, is_superuser=False, is_verified=False)
+        for key, value in create_dict.items():
+            setattr(user, key, value)
+        return self.repository.add_user(user)
+
+    async def update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        for key, value in update_dict.items():
+            setattr(user, key, value)
+        return user
+
+    async def delete(self, user: User) -> None:
+        self.repository.users.pop(user.id, None)
@@ -1,7 +1,7 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum, IntEnum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 from fastapi_users import schemas
@@ -27,6 +27,11 @@ class RatingEnum(IntEnum):
     ten = 10
 
 
+class ExportFormat(Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
 class UserRead(schemas.BaseUser):
     """
     Схема пользователя
@@ -91,3 +96,49 @@ class StatusUpdate(BaseModel):
     film_id: int
     status: Optional[StatusEnum] = None
     rating: Optional[RatingEnum] = None
+
+
+class StatusSet(BaseModel):
+    """
+    Схема статуса текущего пользователя при создании или изменении
+    """
+    status: Optional[StatusEnum] = None
+    rating: Optional[RatingEnum] = None
+
+
+class FilmSummary(BaseModel):
+    """
+    Краткая схема фильма для списков
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    kinopoisk_id: int
+    name: str
+    year: int
+    genres: Optional[list] = None
+    rating_imdb: Optional[float] = None
+    film_length: Optional[int] = None
+
+
+class WatchlistItem(BaseModel):
+    """
+    Схема статуса вместе с кратким описанием фильма
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    status: Optional[StatusEnum] = None
+    rating: Optional[RatingEnum] = None
+    updated_at: datetime
+    film: FilmSummary
+
+
+class WatchlistPage(BaseModel):
+    """
+    Страница списка фильмов пользователя. total - количество статусов с учетом фильтра
+    независимо от limit и offset
+    """
+    items: List[WatchlistItem]
+    total: int
+    limit: int
+    offset: int
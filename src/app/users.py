@@ -1,22 +1,100 @@
-from typing import Optional
+from typing import Any, Dict, Optional, Union
+
+import jwt
 from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users.db import SQLAlchemyUserDatabase
-from fastapi_users import BaseUserManager, FastAPIUsers, IntegerIDMixin
+from fastapi_users.jwt import decode_jwt
+from fastapi_users import BaseUserManager, FastAPIUsers, IntegerIDMixin, exceptions, schemas
 from fastapi_users.authentication import AuthenticationBackend, BearerTransport, JWTStrategy
 
 from src.config import SECRET
 from src.app.models import User
 from src.app.db import get_user_db
+from src.app.passwords import BCRYPT_MAX_PASSWORD_BYTES, PoolPasswordHelper, password_helper
+from src.app.cache import user_cache, user_key
 from src.utils.logging_util import logging
 
 
 class UserManager(IntegerIDMixin, BaseUserManager[User, User.id]):
     reset_password_token_secret = SECRET
     verification_token_secret = SECRET
+    password_helper: PoolPasswordHelper
+
+    async def validate_password(self, password: str, user: Union[schemas.UC, User]) -> None:
+        if len(password.encode()) > BCRYPT_MAX_PASSWORD_BYTES:
+            raise exceptions.InvalidPasswordException(
+                reason=f"Password should be at most {BCRYPT_MAX_PASSWORD_BYTES} bytes"
+            )
+
+    async def create(
+        self, user_create: schemas.UC, safe: bool = False, request: Optional[Request] = None
+    ) -> User:
+        # Повторяет BaseUserManager.create, но хэширует пароль в пуле потоков
+        await self.validate_password(user_create.password, user_create)
+
+        existing_user = await self.user_db.get_by_email(user_create.email)
+        if existing_user is not None:
+            raise exceptions.UserAlreadyExists()
+
+        user_dict = user_create.create_update_dict() if safe else user_create.create_update_dict_superuser()
+        password = user_dict.pop("password")
+        user_dict["hashed_password"] = await self.password_helper.hash_async(password)
+
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def authenticate(self, credentials: OAuth2PasswordRequestForm) -> Optional[User]:
+        # Повторяет BaseUserManager.authenticate, но проверяет пароль в пуле потоков
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Хэшируем впустую, чтобы время ответа не выдавало отсутствие пользователя
+            await self.password_helper.hash_async(credentials.password)
+            return None
+
+        verified, updated_password_hash = await self.password_helper.verify_and_update_async(
+            credentials.password, user.hashed_password
+        )
+        if not verified:
+            return None
+
+        # Стоимость хэширования изменилась - перехэшируем пароль при входе
+        if updated_password_hash is not None:
+            await self.user_db.update(user, {"hashed_password": updated_password_hash})
+            logging.info(f"Пароль пользователя {user.id} перехэширован")
+
+        return user
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        # Хэшируем новый пароль заранее: BaseUserManager._update делает это синхронно
+        password = update_dict.get("password")
+        if password is not None:
+            await self.validate_password(password, user)
+            update_dict = {key: value for key, value in update_dict.items() if key != "password"}
+            update_dict["hashed_password"] = await self.password_helper.hash_async(password)
+
+        return await super()._update(user, update_dict)
 
     async def on_after_register(self, user: User, request: Optional[Request] = None):
         logging.info(f"Пользователь {user.id} зарегистрирован")
 
+    async def on_after_update(
+        self, user: User, update_dict: Dict[str, Any], request: Optional[Request] = None
+    ):
+        # В том числе деактивация пользователя (is_active=False)
+        await user_cache.delete(user_key(user.id))
+
+    async def on_after_verify(self, user: User, request: Optional[Request] = None):
+        await user_cache.delete(user_key(user.id))
+
+    async def on_after_reset_password(self, user: User, request: Optional[Request] = None):
+        await user_cache.delete(user_key(user.id))
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        await user_cache.delete(user_key(user.id))
+
     async def on_after_forgot_password(
         self, user: User, token: str, request: Optional[Request] = None
     ):
@@ -29,7 +107,37 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, User.id]):
 
 
 async def get_user_manager(user_db: SQLAlchemyUserDatabase = Depends(get_user_db)):
-    yield UserManager(user_db)
+    yield UserManager(user_db, password_helper)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """
+    JWT-стратегия, которая после проверки подписи токена берет пользователя из user_cache,
+    а в БД ходит только при промахе кэша
+    """
+
+    async def read_token(self, token: Optional[str], user_manager: UserManager) -> Optional[User]:
+        if token is None:
+            return None
+
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+            user_id = data.get("sub")
+            if user_id is None:
+                return None
+            user_id = user_manager.parse_id(user_id)
+        except (jwt.PyJWTError, exceptions.InvalidID):
+            return None
+
+        user = await user_cache.get(user_key(user_id))
+        if user is None:
+            try:
+                user = await user_manager.get(user_id)
+            except exceptions.UserNotExists:
+                return None
+            await user_cache.set(user_key(user_id), user)
+
+        return user
 
 
 bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
@@ -39,13 +147,29 @@ def get_jwt_strategy() -> JWTStrategy:
     return JWTStrategy(secret=SECRET, lifetime_seconds=3600)
 
 
+def get_cached_jwt_strategy() -> JWTStrategy:
+    return CachedJWTStrategy(secret=SECRET, lifetime_seconds=3600)
+
+
 auth_backend = AuthenticationBackend(
     name="jwt",
     transport=bearer_transport,
     get_strategy=get_jwt_strategy,
 )
 
+cached_auth_backend = AuthenticationBackend(
+    name="jwt",
+    transport=bearer_transport,
+    get_strategy=get_cached_jwt_strategy,
+)
+
+# Выдача токенов и роутеры /users работают с пользователем из БД: он добавляется в сессию при изменении.
 fastapi_users = FastAPIUsers[User, User.id](get_user_manager, [auth_backend])
 
-current_user = fastapi_users.current_user()
-current_active_user = fastapi_users.current_user(active=True)
+# Защищенные эндпоинты на чтение проверяют токен через кэш пользователей
+cached_fastapi_users = FastAPIUsers[User, User.id](get_user_manager, [cached_auth_backend])
+
+current_user = cached_fastapi_users.current_user()
+current_active_user = cached_fastapi_users.current_user(active=True)
+current_superuser = cached_fastapi_users.current_user(active=True, superuser=True)
+current_optional_user = cached_fastapi_users.current_user(optional=True)
@@ -0,0 +1,122 @@
+"""
+Замер накладных расходов API (маршрутизация, валидация, аутентификация, сериализация) без БД:
+слой данных подменяется на InMemoryRepository, хранилище пользователей - на InMemoryUserDatabase.
+
+БД не нужна. Лимиты частоты запросов на время замера снимаются. Кэш ответов лучше выключить,
+чтобы каждый запрос доходил до обработчика:
+
+    CACHE_TTL=0 python -m src.benchmarks.api_overhead --requests 2000
+"""
+import argparse
+import random
+import statistics
+import time
+from asyncio import run
+
+import httpx
+
+from src.app import db
+from src.app.app import app
+from src.app.limits import disable_rate_limits
+from src.app.models import Film
+from src.app.repository import InMemoryRepository, InMemoryUserDatabase
+
+BENCH_EMAIL = "bench-api@example.com"
+BENCH_PASSWORD = "bench-password"
+GENRES = ["драма", "комедия", "триллер", "фантастика", "мультфильм", "боевик", "ужасы", "мелодрама"]
+
+
+def populate(repository: InMemoryRepository, films: int) -> None:
+    """
+    Заполняет репозиторий синтетическими фильмами
+    """
+    rng = random.Random(0)
+    for film_id in range(1, films + 1):
+        repository.add_film(Film(
+            kinopoisk_id=film_id,
+            name=f"Фильм {film_id}",
+            description="Описание " * 20,
+            genres=rng.sample(GENRES, 2),
+            rating_imdb=round(rng.uniform(1, 10), 1),
+            year=rng.randint(1950, 2024),
+            film_length=rng.randint(60, 180),
+            close_film_ids=rng.sample(range(1, films + 1), 5),
+        ))
+
+
+async def get_token(client: httpx.AsyncClient) -> str:
+    """
+    Регистрирует тестового пользователя и возвращает его JWT
+    """
+    response = await client.post("/auth/register", json={
+        "email": BENCH_EMAIL,
+        "password": BENCH_PASSWORD,
+        "username": "bench-api",
+        "birthday": "2000-01-01T00:00:00+00:00",
+    })
+    response.raise_for_status()
+    response = await client.post("/auth/jwt/login", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def measure(client: httpx.AsyncClient, method: str, url: str, requests: int, **kwargs) -> list[float]:
+    """
+    Возвращает латентности (в мс) последовательных запросов к эндпоинту
+    """
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        timings.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<32} mean={statistics.mean(timings):.3f}ms "
+          f"p50={statistics.median(timings):.3f}ms p95={p95:.3f}ms")
+
+
+async def main(requests: int, films: int) -> None:
+    repository = InMemoryRepository()
+    populate(repository, films)
+    db.set_repository(repository)
+    disable_rate_limits()
+
+    async def get_user_db():
+        yield InMemoryUserDatabase(repository)
+
+    app.dependency_overrides[db.get_user_db] = get_user_db
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        token = await get_token(client)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for film_id in range(1, min(films, 50) + 1):
+            response = await client.post(f"/statuses/me/{film_id}", headers=headers,
+                                         json={"status": "Посмотрел", "rating": 8})
+            response.raise_for_status()
+
+        cases = [
+            ("GET /films/{id}", "GET", "/films/1", {}),
+            ("GET /films/top_films_by_genre", "GET", "/films/top_films_by_genre/драма/20", {}),
+            ("GET /films/{id}/recommendations", "GET", "/films/1/recommendations", {}),
+            ("GET /statuses/me", "GET", "/statuses/me", {"headers": headers}),
+            ("GET /statuses/me/watchlist", "GET", "/statuses/me/watchlist", {"headers": headers}),
+            ("POST /statuses/me/{id}", "POST", "/statuses/me/1",
+             {"headers": headers, "json": {"status": "Смотрю", "rating": 7}}),
+        ]
+        for label, method, url, kwargs in cases:
+            report(label, await measure(client, method, url, requests, **kwargs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--films", type=int, default=10000)
+    args = parser.parse_args()
+    run(main(args.requests, args.films))
@@ -0,0 +1,76 @@
+"""
+Замер накладных расходов аутентификации на один запрос: без кэша пользователей и с ним.
+
+Требует доступной БД (переменные из .env). Запуск:
+
+    python -m src.benchmarks.auth_overhead --requests 2000
+"""
+import argparse
+import statistics
+import time
+from asyncio import run
+
+import httpx
+
+from src.app.app import app
+from src.app.cache import user_cache
+
+BENCH_EMAIL = "bench-auth@example.com"
+BENCH_PASSWORD = "bench-password"
+
+
+async def get_token(client: httpx.AsyncClient) -> str:
+    """
+    Регистрирует (если нужно) тестового пользователя и возвращает его JWT
+    """
+    await client.post("/auth/register", json={
+        "email": BENCH_EMAIL,
+        "password": BENCH_PASSWORD,
+        "username": "bench-auth",
+        "birthday": "2000-01-01T00:00:00+00:00",
+    })
+    response = await client.post("/auth/jwt/login", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def measure(client: httpx.AsyncClient, token: str, requests: int) -> list[float]:
+    """
+    Возвращает латентности (в мс) последовательных запросов к защищенному эндпоинту
+    """
+    headers = {"Authorization": f"Bearer {token}"}
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get("/authenticated-route", headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<12} mean={statistics.mean(timings):.3f}ms "
+          f"p50={statistics.median(timings):.3f}ms p95={p95:.3f}ms")
+
+
+async def main(requests: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        token = await get_token(client)
+
+        ttl = user_cache.local.ttl
+        user_cache.local.ttl = 0
+        user_cache.local.clear()
+        report("no cache", await measure(client, token, requests))
+
+        user_cache.local.ttl = ttl
+        report("user cache", await measure(client, token, requests))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    run(main(args.requests))
@@ -0,0 +1,72 @@
+"""
+Замер накладных расходов логирования под нагрузкой: синхронный FileHandler (как раньше)
+против QueueHandler с записью в фоновом потоке.
+
+Параллельные задачи event loop пишут записи в лог; замеряется время одного вызова логгера
+и общее время прогона. БД не требуется. Запуск:
+
+    python -m src.benchmarks.logging_overhead --tasks 100 --records 200
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+
+from src.utils.logging_util import JsonFormatter, create_file_handler, create_queue_handler
+
+
+async def write_records(logger: logging.Logger, records: int, timings: list) -> None:
+    for i in range(records):
+        started = time.perf_counter()
+        logger.info('record %s', i, extra={'latency_ms': 1.0})
+        timings.append((time.perf_counter() - started) * 1_000_000)
+        await asyncio.sleep(0)
+
+
+async def run_load(logger: logging.Logger, tasks: int, records: int) -> tuple:
+    timings = []
+    started = time.perf_counter()
+    await asyncio.gather(*(write_records(logger, records, timings) for _ in range(tasks)))
+    return timings, time.perf_counter() - started
+
+
+def make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f'bench.{name}')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+def report(label: str, timings: list, total: float) -> None:
+    q = statistics.quantiles(timings, n=100)
+    print(f'{label:<8} total={total:.3f}s per call: p50={q[49]:.1f}us p99={q[98]:.1f}us max={max(timings):.1f}us')
+
+
+def main(tasks: int, records: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_handler = logging.FileHandler(os.path.join(tmp, 'sync.log'))
+        sync_handler.setFormatter(JsonFormatter())
+        sync_logger = make_logger('sync', sync_handler)
+        report('sync', *asyncio.run(run_load(sync_logger, tasks, records)))
+        sync_handler.close()
+
+        file_handler = create_file_handler(os.path.join(tmp, 'queue.log'))
+        queue_handler, listener = create_queue_handler(file_handler)
+        queue_logger = make_logger('queue', queue_handler)
+        listener.start()
+        report('queue', *asyncio.run(run_load(queue_logger, tasks, records)))
+        # Время, за которое фоновый поток дописал очередь, в латентность запросов не входит
+        listener.stop()
+        file_handler.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tasks', type=int, default=100)
+    parser.add_argument('--records', type=int, default=200)
+    args = parser.parse_args()
+    main(args.tasks, args.records)
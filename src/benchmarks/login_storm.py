@@ -0,0 +1,79 @@
+"""
+Нагрузочный тест: латентность /films во время шквала логинов.
+
+Сначала замеряются запросы к /films/{film_id} без фоновой нагрузки, затем те же запросы
+на фоне параллельных логинов. Лимиты частоты запросов на время замера снимаются.
+Требует доступной БД с заполненной таблицей films. Запуск:
+
+    python -m src.benchmarks.login_storm --film-id 301 --logins 32 --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from src.app.app import app
+from src.app.limits import disable_rate_limits
+
+STORM_EMAIL = "bench-storm@example.com"
+STORM_PASSWORD = "bench-password"
+
+
+async def login_forever(client: httpx.AsyncClient, stop: asyncio.Event) -> int:
+    """
+    Логинится в цикле до сигнала stop и возвращает число выполненных логинов
+    """
+    logins = 0
+    while not stop.is_set():
+        await client.post("/auth/jwt/login", data={"username": STORM_EMAIL, "password": STORM_PASSWORD})
+        logins += 1
+    return logins
+
+
+async def measure(client: httpx.AsyncClient, film_id: int, requests: int) -> list[float]:
+    """
+    Возвращает латентности (в мс) последовательных запросов к /films/{film_id}
+    """
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(f"/films/{film_id}")
+        timings.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    q = statistics.quantiles(timings, n=100)
+    print(f"{label:<12} p50={q[49]:.2f}ms p95={q[94]:.2f}ms p99={q[98]:.2f}ms max={max(timings):.2f}ms")
+
+
+async def main(film_id: int, logins: int, requests: int) -> None:
+    disable_rate_limits()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/auth/register", json={
+            "email": STORM_EMAIL,
+            "password": STORM_PASSWORD,
+            "username": "bench-storm",
+            "birthday": "2000-01-01T00:00:00+00:00",
+        })
+
+        report("baseline", await measure(client, film_id, requests))
+
+        stop = asyncio.Event()
+        storm = [asyncio.create_task(login_forever(client, stop)) for _ in range(logins)]
+        report("login storm", await measure(client, film_id, requests))
+        stop.set()
+        print(f"logins during storm: {sum(await asyncio.gather(*storm))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--film-id", type=int, required=True)
+    parser.add_argument("--logins", type=int, default=32, help="количество параллельных логинов")
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.film_id, args.logins, args.requests))
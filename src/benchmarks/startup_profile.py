@@ -0,0 +1,125 @@
+"""
+Профиль запуска воркера: время импорта по модулям (python -X importtime) и время до первого запроса.
+
+Оба замера выполняются в отдельных процессах, как при старте нового воркера. Запуск:
+
+    python -m src.benchmarks.startup_profile
+    python -m src.benchmarks.startup_profile --no-startup   # без БД: пропустить on_startup
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+
+APP_MODULE = "src.app.app"
+
+
+def profile_imports(top: int) -> None:
+    """
+    Печатает самые долгие импорты модулей и суммарное собственное время импорта по пакетам
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {APP_MODULE}"],
+        capture_output=True, text=True, check=True,
+    )
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    total_us = max(cumulative for _, _, cumulative in modules)
+    print(f"import {APP_MODULE}: {total_us / 1000:.1f}ms")
+
+    print(f"\nTop {top} modules by cumulative import time:")
+    for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[2], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  (self {self_us / 1000:6.1f}ms)  {name}")
+
+    packages = defaultdict(int)
+    for name, self_us, _ in modules:
+        packages[name.split(".")[0]] += self_us
+    print(f"\nTop {top} packages by own import time:")
+    for package, self_us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:8.1f}ms  {package}")
+
+
+async def run_startup(app) -> None:
+    """
+    Выполняет lifespan startup приложения, как это делает ASGI-сервер
+    """
+    messages = asyncio.Queue()
+    await messages.put({"type": "lifespan.startup"})
+    done = asyncio.get_running_loop().create_future()
+
+    async def send(message):
+        if message["type"] == "lifespan.startup.complete":
+            done.set_result(None)
+        elif message["type"] == "lifespan.startup.failed":
+            done.set_exception(RuntimeError(message.get("message")))
+
+    asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, messages.get, send))
+    await done
+
+
+async def first_request(path: str, startup: bool) -> dict:
+    """
+    Импортирует приложение, выполняет startup и первый запрос. Возвращает длительности этапов в мс
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    import httpx
+    from src.app.app import app
+    timings["import"] = (time.perf_counter() - started) * 1000
+
+    if startup:
+        stage = time.perf_counter()
+        await run_startup(app)
+        timings["startup"] = (time.perf_counter() - stage) * 1000
+
+    stage = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://profile") as client:
+        response = await client.get(path)
+    timings["first_request"] = (time.perf_counter() - stage) * 1000
+    timings["status_code"] = response.status_code
+    timings["total"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def profile_first_request(path: str, startup: bool) -> None:
+    """
+    Печатает время до первого запроса в новом процессе, включая запуск интерпретатора
+    """
+    command = [sys.executable, "-m", "src.benchmarks.startup_profile", "--child", "--path", path]
+    if not startup:
+        command.append("--no-startup")
+
+    started = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+    print(f"\nTime to first request GET {path} (status {timings.pop('status_code')}):")
+    for stage, ms in timings.items():
+        print(f"  {stage:<14} {ms:8.1f}ms")
+    print(f"  {'process wall':<14} {wall_ms:8.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--path", default="/openapi.json", help="эндпоинт первого запроса")
+    parser.add_argument("--no-startup", action="store_true", help="не выполнять on_startup (нет БД)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(first_request(args.path, not args.no_startup))))
+    else:
+        profile_imports(args.top)
+        profile_first_request(args.path, not args.no_startup)
@@ -0,0 +1,37 @@
+"""
+Замер холодного старта воркера: импорт приложения, инициализация схемы через create_all
+(как раньше) против проверки версии схемы, и прогрев пула соединений и кэша.
+
+Каждый запуск - отдельный процесс, как у нового воркера. Требует БД с примененными миграциями. Запуск:
+
+    python -m src.benchmarks.startup_time
+"""
+import time
+from asyncio import run
+
+started = time.perf_counter()
+from src.app.app import app  # noqa: E402,F401
+import_time = time.perf_counter() - started
+
+from src.app import db  # noqa: E402
+from src.routers.films import warm_up_film_cache  # noqa: E402
+
+
+async def timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    print(f"import src.app.app       {import_time * 1000:.1f}ms")
+    # Первый запрос к БД в процессе также открывает соединение - меряем оба пути после этого
+    await timed(db.verify_schema_version())
+    print(f"create_all (before)      {await timed(db.create_db_and_tables()) * 1000:.1f}ms")
+    print(f"verify version (after)   {await timed(db.verify_schema_version()) * 1000:.1f}ms")
+    print(f"warm up connection pool  {await timed(db.warm_up_connection_pool()) * 1000:.1f}ms")
+    print(f"warm up film cache       {await timed(warm_up_film_cache()) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    run(main())
@@ -2,8 +2,8 @@ import os
 from dotenv import load_dotenv
 
 
-if not load_dotenv():
-    raise Exception('.env file not found! Please create it in src folder!')
+# Значения из .env дополняют переменные окружения. Без .env используются переменные окружения и значения по умолчанию
+load_dotenv()
 
 DB_USER = os.environ.get('DB_USER', default='postgres')
 DB_PASS = os.environ.get('DB_PASS', default='postgres')
@@ -13,4 +13,75 @@ DB_NAME = os.environ.get('DB_NAME', default=5432)
 
 SECRET = os.environ.get('SECRET', default='super_secret')
 
+# Логи: JSON-записи в файл с ротацией по размеру и в консоль.
+# LOG_ACCESS_SAMPLE_RATE - доля успешных запросов, попадающих в access-лог (ошибки пишутся всегда)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_LEVEL = os.environ.get('LOG_LEVEL', default='INFO')
+LOG_FILE = os.environ.get('LOG_FILE', default=os.path.join(PROJECT_DIR, 'app.log'))
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', default=10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', default=5))
+LOG_ACCESS_SAMPLE_RATE = float(os.environ.get('LOG_ACCESS_SAMPLE_RATE', default=1.0))
+
+# Кэш пользователей, найденных по JWT. USER_CACHE_TTL=0 отключает кэш
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', default=30))
+USER_CACHE_MAXSIZE = int(os.environ.get('USER_CACHE_MAXSIZE', default=10000))
+
+# Хэширование паролей: стоимость bcrypt и размер пула потоков, в котором оно выполняется
+PASSWORD_HASH_ROUNDS = int(os.environ.get('PASSWORD_HASH_ROUNDS', default=12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', default=min(4, os.cpu_count() or 1)))
+
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Реплики для чтения каталога фильмов и статусов в формате 'host1:port1,host2:port2'.
+# Пользователь, имя БД и пароль те же, что у основной БД. Без реплик все запросы идут в основную БД
+DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', default='').split(',') if host.strip()]
+REPLICA_DATABASE_URLS = [f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{host}/{DB_NAME}" for host in DB_REPLICA_HOSTS]
+
+# Сколько секунд после записи статусы пользователя читаются из основной БД (read-your-writes)
+DB_REPLICA_STICKINESS_SECONDS = float(os.environ.get('DB_REPLICA_STICKINESS_SECONDS', default=5))
+
+# Количество воркеров и лимит соединений с БД на все воркеры: пул каждого воркера получает свою долю
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', default=1))
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', default=20))
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', default=max(1, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', default=0))
+
+# Время ожидания соединения из пула. При перегрузке запрос быстро получает 503, а не висит
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', default=5))
+
+# Максимум одновременных запросов на воркер, сверх него - 503
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', default=DB_POOL_SIZE * 4))
+
+# Лимиты частоты запросов на пользователя (или IP) в формате 'токенов_в_секунду/всплеск'.
+# RATE_LIMITS задает лимиты отдельных маршрутов: 'имя_маршрута=5/10,имя_маршрута=1/5'.
+# Пустой RATE_LIMIT_DEFAULT - без ограничения для остальных маршрутов
+RATE_LIMIT_DEFAULT = os.environ.get('RATE_LIMIT_DEFAULT', default='20/40')
+RATE_LIMITS = os.environ.get(
+    'RATE_LIMITS',
+    default='films:get_top_films_by_genre=5/10,'
+            'statuses:create_or_update_my_status=5/10,'
+            'statuses:create_or_update_status=5/10',
+)
+
+# Максимальный размер топа фильмов по жанру
+TOP_FILMS_MAX_COUNT = int(os.environ.get('TOP_FILMS_MAX_COUNT', default=100))
+
+# Максимальный размер страницы списка фильмов пользователя (watchlist)
+WATCHLIST_MAX_LIMIT = int(os.environ.get('WATCHLIST_MAX_LIMIT', default=100))
+
+# Размер пачки строк, читаемых из БД за раз при потоковой выгрузке
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', default=1000))
+
+# Выгрузка пропускает строки, измененные меньше EXPORT_SETTLE_SECONDS назад: updated_at - время начала
+# транзакции, и транзакция, начатая раньше, может завершиться уже после выгрузки с более поздним Last-Modified
+EXPORT_SETTLE_SECONDS = float(os.environ.get('EXPORT_SETTLE_SECONDS', default=10))
+
+# Прогрев кэша при старте воркера: топ фильмов такого размера для каждого жанра (0 - без прогрева)
+WARMUP_TOP_FILMS_COUNT = int(os.environ.get('WARMUP_TOP_FILMS_COUNT', default=10))
+
+# Кэш фильмов, жанров и статусов пользователей: 'memory' (в памяти воркера) или 'redis'.
+# Если задан REDIS_URL, локальные кэши воркеров инвалидируются через Redis pub/sub
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', default='memory')
+CACHE_TTL = float(os.environ.get('CACHE_TTL', default=300))
+CACHE_MAXSIZE = int(os.environ.get('CACHE_MAXSIZE', default=10000))
+REDIS_URL = os.environ.get('REDIS_URL')
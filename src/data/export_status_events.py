@@ -0,0 +1,160 @@
+"""
+Выгрузка журнала изменений статусов (status_events) для аналитики в сжатые файлы NDJSON или Parquet.
+
+Каждый запуск выгружает события после последнего выгруженного (его id хранится в файле состояния
+в каталоге выгрузки) в один новый файл. События читаются пачками, память не зависит от их количества.
+
+    python ./src/data/export_status_events.py --output-dir ./exports --format ndjson
+"""
+import os
+import json
+import gzip
+import argparse
+from asyncio import run
+from datetime import datetime
+from typing import Sequence
+
+from src.app.models import StatusEvent
+from src.app.db import db_stream_status_events
+from src.utils.logging_util import logging
+
+STATE_FILENAME = '.last_status_event_id'
+
+
+def event_to_dict(event: StatusEvent) -> dict:
+    """
+    Возвращает событие в виде словаря для выгрузки. Статусы выгружаются именами, рейтинги - числами,
+    время остается datetime: каждый формат записывает его своим типом
+
+    :param event: событие изменения статуса
+    """
+    return {
+        'id': event.id,
+        'status_id': event.status_id,
+        'user_id': event.user_id,
+        'film_id': event.film_id,
+        'status': event.status.name if event.status else None,
+        'rating': int(event.rating) if event.rating else None,
+        'previous_status': event.previous_status.name if event.previous_status else None,
+        'previous_rating': int(event.previous_rating) if event.previous_rating else None,
+        'created_at': event.created_at,
+    }
+
+
+class NdjsonWriter:
+    """
+    Пишет события в NDJSON, сжатый gzip. Время записывается строкой ISO 8601
+    """
+
+    extension = 'ndjson.gz'
+
+    def __init__(self, path: str):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, rows: Sequence[dict]) -> None:
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False, default=datetime.isoformat))
+            self.file.write('\n')
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetWriter:
+    """
+    Пишет события в Parquet со сжатием zstd, по группе строк на пачку. Требует pyarrow
+    """
+
+    extension = 'parquet'
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('status_id', pa.int64()),
+            ('user_id', pa.int64()),
+            ('film_id', pa.int64()),
+            ('status', pa.string()),
+            ('rating', pa.int8()),
+            ('previous_status', pa.string()),
+            ('previous_rating', pa.int8()),
+            ('created_at', pa.timestamp('us', tz='UTC')),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows: Sequence[dict]) -> None:
+        self.writer.write_table(self.pa.Table.from_pylist(list(rows), schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+WRITERS = {'ndjson': NdjsonWriter, 'parquet': ParquetWriter}
+
+
+def read_last_id(output_dir: str) -> int:
+    path = os.path.join(output_dir, STATE_FILENAME)
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return int(f.read().strip())
+
+
+def write_last_id(output_dir: str, last_id: int) -> None:
+    path = os.path.join(output_dir, STATE_FILENAME)
+    with open(path + '.tmp', 'w') as f:
+        f.write(str(last_id))
+    os.replace(path + '.tmp', path)
+
+
+async def export_status_events(output_dir: str, export_format: str, batch_size: int, settle_seconds: float) -> None:
+    """
+    Выгружает новые события в файл status_events_<первый id>-<последний id>.<расширение>
+
+    :param output_dir: каталог выгрузки
+    :param export_format: ndjson или parquet
+    :param batch_size: размер пачки событий
+    :param settle_seconds: минимальный возраст выгружаемых событий в секундах
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    writer_class = WRITERS[export_format]
+    after_id = read_last_id(output_dir)
+    partial_path = os.path.join(output_dir, f'status_events.{writer_class.extension}.partial')
+
+    writer = None
+    first_id = last_id = None
+    exported = 0
+    try:
+        async for batch in db_stream_status_events(after_id, batch_size, settle_seconds):
+            if writer is None:
+                writer = writer_class(partial_path)
+                first_id = batch[0].id
+            writer.write([event_to_dict(event) for event in batch])
+            last_id = batch[-1].id
+            exported += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        logging.info('Новых событий статусов нет')
+        return
+
+    # Файл получает итоговое имя, и только затем сдвигается состояние: при сбое события выгрузятся повторно
+    os.replace(partial_path, os.path.join(output_dir, f'status_events_{first_id}-{last_id}.{writer_class.extension}'))
+    write_last_id(output_dir, last_id)
+    logging.info(f'Выгружено событий статусов: {exported}, id {first_id}-{last_id}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--format', choices=sorted(WRITERS), default='ndjson')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--settle-seconds', type=float, default=60,
+                        help='не выгружать события моложе (незавершенные транзакции с меньшими id)')
+    args = parser.parse_args()
+    run(export_status_events(args.output_dir, args.format, args.batch_size, args.settle_seconds))
@@ -1,4 +1,31 @@
+import os
+import argparse
+
 import uvicorn
 
+from src.app.cache import check_cache_for_workers
+
 if __name__ == "__main__":
-    uvicorn.run("src.app.app:app", host="localhost", log_level="info", reload=True)
+    parser = argparse.ArgumentParser(description="Запуск сервиса Посмотрим")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="количество воркеров; при значении больше 1 автоперезагрузка отключается")
+    parser.add_argument("--forwarded-allow-ips", default=None,
+                        help="адреса прокси, которым доверяется X-Forwarded-For (IP клиента для лимитов)")
+    args = parser.parse_args()
+
+    try:
+        check_cache_for_workers(args.workers)
+    except Exception as e:
+        parser.error(str(e))
+
+    # Access-лог пишет AccessLogMiddleware через очередь и с семплированием, собственный лог uvicorn отключен
+    if args.workers > 1:
+        # Воркеры наследуют окружение: по WEB_CONCURRENCY config делит лимит соединений с БД между ними
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+        uvicorn.run("src.app.app:app", host=args.host, port=args.port, log_level="info", access_log=False,
+                    forwarded_allow_ips=args.forwarded_allow_ips, workers=args.workers)
+    else:
+        uvicorn.run("src.app.app:app", host=args.host, port=args.port, log_level="info", access_log=False,
+                    forwarded_allow_ips=args.forwarded_allow_ips, reload=True)
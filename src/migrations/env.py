@@ -0,0 +1,55 @@
+import asyncio
+
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.config import DATABASE_URL
+from src.app.models import Base
+from src.utils.logging_util import logging  # noqa: F401 - настраивает логирование
+
+target_metadata = Base.metadata
+
+# sqlalchemy.url из конфигурации alembic (например, БД интеграционных тестов) важнее настроек сервиса
+DATABASE_URL = context.config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def run_migrations_offline() -> None:
+    """
+    Генерирует SQL миграций без подключения к БД (alembic upgrade head --sql)
+    """
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """
+    Применяет миграции к основной БД
+    """
+    engine = create_async_engine(DATABASE_URL, poolclass=pool.NullPool)
+
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_async_migrations())
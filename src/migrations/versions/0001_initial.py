@@ -0,0 +1,75 @@
+"""Начальная схема: пользователи, фильмы, статусы
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('username', sa.String(length=32), nullable=False),
+        sa.Column('birthday', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('email', sa.String(length=320), nullable=False),
+        sa.Column('hashed_password', sa.String(length=1024), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('is_superuser', sa.Boolean(), nullable=False),
+        sa.Column('is_verified', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'films',
+        sa.Column('kinopoisk_id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(length=256), nullable=False),
+        sa.Column('slogan', sa.String(length=1024), nullable=True),
+        sa.Column('description', sa.String(length=4096), nullable=True),
+        sa.Column('genres', postgresql.ARRAY(sa.String(length=32)), nullable=True),
+        sa.Column('rating_imdb', sa.Float(), nullable=True),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('film_length', sa.Integer(), nullable=True),
+        sa.Column('close_film_ids', postgresql.ARRAY(sa.Integer()), nullable=True),
+        sa.PrimaryKeyConstraint('kinopoisk_id'),
+    )
+
+    op.create_table(
+        'statuses',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('status', sa.Enum('watching', 'watched', 'plan', 'quit', name='statusenum'), nullable=True),
+        sa.Column('rating', sa.Enum('one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten',
+                                    name='ratingenum'), nullable=True),
+        sa.Column('film_id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['film_id'], ['films.kinopoisk_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('statuses')
+    op.drop_table('films')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='ratingenum').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='statusenum').drop(op.get_bind(), checkfirst=True)
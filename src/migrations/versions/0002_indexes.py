@@ -0,0 +1,31 @@
+"""Индексы для выборки фильмов по жанру и статусов пользователя
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_films_genres', 'films', ['genres'], postgresql_using='gin')
+    op.create_index('ix_films_rating_imdb', 'films', ['rating_imdb'])
+    op.create_index('ix_statuses_user_id_film_id', 'statuses', ['user_id', 'film_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_statuses_user_id_film_id', table_name='statuses')
+    op.drop_index('ix_films_rating_imdb', table_name='films')
+    op.drop_index('ix_films_genres', table_name='films')
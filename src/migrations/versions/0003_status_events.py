@@ -0,0 +1,46 @@
+"""Журнал изменений статусов (transactional outbox) для выгрузки в аналитику
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Типы созданы в 0001
+status_enum = postgresql.ENUM(name='statusenum', create_type=False)
+rating_enum = postgresql.ENUM(name='ratingenum', create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'status_events',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('status_id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('film_id', sa.BigInteger(), nullable=False),
+        sa.Column('status', status_enum, nullable=True),
+        sa.Column('rating', rating_enum, nullable=True),
+        sa.Column('previous_status', status_enum, nullable=True),
+        sa.Column('previous_rating', rating_enum, nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['status_id'], ['statuses.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('status_events')
@@ -0,0 +1,34 @@
+"""Время последнего изменения фильмов и статусов для инкрементальной выгрузки
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('films', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(),
+                                     nullable=False))
+    op.add_column('statuses', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(),
+                                        nullable=False))
+    op.create_index('ix_films_updated_at', 'films', ['updated_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_films_updated_at', table_name='films')
+    op.drop_column('statuses', 'updated_at')
+    op.drop_column('films', 'updated_at')
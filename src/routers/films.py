@@ -1,11 +1,92 @@
-from fastapi import APIRouter, HTTPException, status
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, status
+from fastapi.encoders import jsonable_encoder
 
 from src.utils.exceptions import FilmNotFound
-from src.app.db import db_get_film, db_get_film_recommendations, db_get_top_films_by_genre
+from src.app.cache import cache, film_key, film_recommendations_key, top_films_key
+from src.config import WARMUP_TOP_FILMS_COUNT, TOP_FILMS_MAX_COUNT, EXPORT_BATCH_SIZE, EXPORT_SETTLE_SECONDS
+from src.app.models import Film
+from src.app.schemas import ExportFormat
+from src.app.users import current_superuser
+from src.app.db import (
+    db_get_film,
+    db_get_film_recommendations,
+    db_get_top_films_by_genre,
+    db_get_genres,
+    db_get_films_last_modified,
+    db_stream_films
+)
+from src.utils.export import export_response, get_modified_since
 
 router = APIRouter()
 
 
+async def get_cached_top_films_by_genre(genre: str, count: int) -> list:
+    """
+    Возвращает топ фильмов жанра из кэша или из БД. Пустой результат не кэшируется
+
+    :param genre: жанр фильма
+    :param count: количество фильмов
+    """
+    films = await cache.get(top_films_key(genre, count))
+    if films:
+        return films
+
+    films = jsonable_encoder(await db_get_top_films_by_genre(genre, count))
+    if films:
+        await cache.set(top_films_key(genre, count), films)
+    return films
+
+
+async def warm_up_film_cache() -> None:
+    """
+    Заполняет кэш топом фильмов размера WARMUP_TOP_FILMS_COUNT по каждому жанру
+    """
+    if WARMUP_TOP_FILMS_COUNT <= 0:
+        return
+
+    for genre in await db_get_genres():
+        await get_cached_top_films_by_genre(genre, WARMUP_TOP_FILMS_COUNT)
+
+
+@router.get(
+    path="/export",
+    dependencies=[Depends(current_superuser)],
+    name="films:export_films",
+    responses={
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "The catalog has not changed since modified_since",
+        },
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "Not a superuser",
+        },
+    },
+)
+async def export_films(export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+                       modified_since: Optional[datetime] = None,
+                       if_modified_since: Optional[str] = Header(None)):
+    """
+    Потоково выгружает каталог фильмов в NDJSON или CSV.
+    С modified_since (или заголовком If-Modified-Since) выгружаются только фильмы, измененные позже
+
+    :param export_format: формат выгрузки
+    :param modified_since: время предыдущей выгрузки
+    :param if_modified_since: заголовок If-Modified-Since
+    """
+    since, whole_seconds = get_modified_since(modified_since, if_modified_since)
+    return export_response(batches=db_stream_films(since, EXPORT_BATCH_SIZE, EXPORT_SETTLE_SECONDS),
+                           model=Film,
+                           export_format=export_format,
+                           last_modified=await db_get_films_last_modified(EXPORT_SETTLE_SECONDS),
+                           modified_since=since,
+                           filename="films",
+                           whole_seconds=whole_seconds)
+
+
 @router.get(
     path="/{film_id}",
     name="films:get_film",
@@ -24,8 +105,13 @@ async def get_film(film_id: int):
 
     :param film_id: id фильма
     """
+    film = await cache.get(film_key(film_id))
+    if film is not None:
+        return film
+
     try:
-        film = await db_get_film(film_id)
+        film = jsonable_encoder(await db_get_film(film_id))
+        await cache.set(film_key(film_id), film)
         return film
     except FilmNotFound:
         raise HTTPException(status_code=404, detail="Film does not exist")
@@ -43,7 +129,7 @@ async def get_film(film_id: int):
         },
     },
 )
-async def get_top_films_by_genre(genre: str, count: int):
+async def get_top_films_by_genre(genre: str, count: int = Path(gt=0, le=TOP_FILMS_MAX_COUNT)):
     """
     Возвращает список размера count сущностей класса Film, в выбранном жанре.
     Фильмы отсортированы по рейтингу IMDB от лучших к худшим
@@ -51,7 +137,7 @@ async def get_top_films_by_genre(genre: str, count: int):
     :param genre: жанр фильма
     :param count: количество фильмов, которое нужно вернуть
     """
-    films = await db_get_top_films_by_genre(genre, count)
+    films = await get_cached_top_films_by_genre(genre, count)
     if films:
         return films
     else:
@@ -77,8 +163,13 @@ async def get_film_recommendations(film_id: int):
 
     :param film_id: id фильма, для которого нужны рекомендации
     """
+    films = await cache.get(film_recommendations_key(film_id))
+    if films is not None:
+        return films
+
     try:
-        films = await db_get_film_recommendations(film_id)
+        films = jsonable_encoder(await db_get_film_recommendations(film_id))
+        await cache.set(film_recommendations_key(film_id), films)
         return films
     except FilmNotFound:
         raise HTTPException(status_code=404, detail="Film does not exist")
@@ -1,22 +1,345 @@
+from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, status, HTTPException, Form
+from fastapi import APIRouter, Depends, Header, Query, status, HTTPException
+from fastapi.encoders import jsonable_encoder
 
-from src.app.users import current_user
-from src.app.schemas import StatusEnum, RatingEnum, StatusUpdate
+from src.app.models import User, Status
+from src.app.cache import cache, user_statuses_key, user_statuses_ttl, all_user_statuses_keys
+from src.app.users import current_user, current_superuser
+from src.config import EXPORT_BATCH_SIZE, EXPORT_SETTLE_SECONDS, WATCHLIST_MAX_LIMIT
+from src.app.schemas import ExportFormat, StatusEnum, RatingEnum, StatusSet, StatusUpdate, WatchlistPage
+from src.utils.export import export_response, get_modified_since
 from src.utils.exceptions import UserNotFound, FilmNotFound
 from src.app import db
 
 statuses_router = APIRouter()
 
 
+async def get_cached_user_statuses(user_id: int, film_status: Optional[StatusEnum] = None,
+                                   check_user: bool = True) -> list:
+    """
+    Возвращает статусы пользователя (с фильтром по статусу, если он задан) из кэша или из БД
+
+    :param user_id: id пользователя
+    :param film_status: статус
+    :param check_user: проверять ли существование пользователя
+    """
+    key = user_statuses_key(user_id, film_status.name if film_status else None)
+    user_statuses = await cache.get(key)
+    if user_statuses is not None:
+        return user_statuses
+
+    if film_status is None:
+        user_statuses = await db.db_get_user_statuses(user_id, check_user=check_user)
+    else:
+        user_statuses = await db.db_get_user_statuses_by_status(user_id, film_status, check_user=check_user)
+
+    user_statuses = jsonable_encoder(user_statuses)
+    await cache.set(key, user_statuses, ttl=user_statuses_ttl)
+    return user_statuses
+
+
+async def create_or_update_cached_status(user_id: int, film_id: int, film_status: Optional[StatusEnum],
+                                         rating: Optional[RatingEnum], check_user: bool = True):
+    """
+    Создает/редактирует статус и сбрасывает закэшированные статусы пользователя во всех воркерах
+
+    :param user_id: id пользователя
+    :param film_id: id фильма
+    :param film_status: статус фильма пользователя
+    :param rating: пользовательский рейтинг фильма
+    :param check_user: проверять ли существование пользователя
+    """
+    result = await db.db_create_or_update_status(user_id, film_id, film_status, rating, check_user=check_user)
+    await cache.delete(*all_user_statuses_keys(user_id))
+    return result
+
+
+async def get_watchlist_page(user_id: int, film_status: Optional[StatusEnum], limit: int,
+                             offset: int) -> WatchlistPage:
+    """
+    Возвращает страницу статусов пользователя с краткими описаниями фильмов
+
+    :param user_id: id пользователя
+    :param film_status: фильтр по статусу
+    :param limit: размер страницы
+    :param offset: смещение от начала списка
+    """
+    items, total = await db.db_get_user_watchlist(user_id, film_status, limit, offset)
+    return WatchlistPage(items=items, total=total, limit=limit, offset=offset)
+
+
+async def export_user_statuses(user_id: int, export_format: ExportFormat, modified_since: Optional[datetime],
+                               if_modified_since: Optional[str]):
+    """
+    Потоково выгружает статусы пользователя в NDJSON или CSV
+
+    :param user_id: id пользователя
+    :param export_format: формат выгрузки
+    :param modified_since: время предыдущей выгрузки
+    :param if_modified_since: заголовок If-Modified-Since
+    """
+    since, whole_seconds = get_modified_since(modified_since, if_modified_since)
+    return export_response(batches=db.db_stream_user_statuses(user_id, since, EXPORT_BATCH_SIZE,
+                                                               EXPORT_SETTLE_SECONDS),
+                           model=Status,
+                           export_format=export_format,
+                           last_modified=await db.db_get_user_statuses_last_modified(user_id, EXPORT_SETTLE_SECONDS),
+                           modified_since=since,
+                           filename=f"statuses_{user_id}",
+                           whole_seconds=whole_seconds)
+
+
+# Статусы текущего пользователя. id берется из токена, поэтому пользователя в БД не проверяем.
+# Эндпоинты /me объявлены раньше /{user_id}, чтобы "me" не разбиралось как user_id
+
+@statuses_router.get(
+    path="/me",
+    name="statuses:get_my_statuses",
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "description": "User has no statuses",
+        },
+    },
+)
+async def get_my_statuses(user: User = Depends(current_user)):
+    """
+    Возвращает все статусы фильмов текущего пользователя
+
+    :param user: экземпляр модели User из токена
+    """
+    user_statuses = await get_cached_user_statuses(user.id, check_user=False)
+
+    if user_statuses:
+        return user_statuses
+    else:
+        raise HTTPException(status_code=404,
+                            detail="User has no statuses")
+
+
+@statuses_router.get(
+    path="/me/by_status/{film_status}",
+    name="statuses:get_my_statuses_by_status",
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "description": "User has no statuses",
+        },
+    },
+)
+async def get_my_statuses_by_status(film_status: StatusEnum, user: User = Depends(current_user)):
+    """
+    Возвращает статусы и рейтинги текущего пользователя с фильтром по статусу
+
+    :param film_status: статус
+    :param user: экземпляр модели User из токена
+    """
+    user_statuses = await get_cached_user_statuses(user.id, film_status, check_user=False)
+
+    if user_statuses:
+        return user_statuses
+    else:
+        raise HTTPException(status_code=404,
+                            detail="User has no statuses")
+
+
+@statuses_router.get(
+    path="/me/watchlist",
+    response_model=WatchlistPage,
+    name="statuses:get_my_watchlist",
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+    },
+)
+async def get_my_watchlist(film_status: Optional[StatusEnum] = Query(None, alias="status"),
+                           limit: int = Query(20, gt=0, le=WATCHLIST_MAX_LIMIT),
+                           offset: int = Query(0, ge=0),
+                           user: User = Depends(current_user)):
+    """
+    Возвращает страницу статусов текущего пользователя вместе с краткими описаниями фильмов
+
+    :param film_status: фильтр по статусу
+    :param limit: размер страницы
+    :param offset: смещение от начала списка
+    :param user: экземпляр модели User из токена
+    """
+    return await get_watchlist_page(user.id, film_status, limit, offset)
+
+
+@statuses_router.get(
+    path="/me/export",
+    name="statuses:export_my_statuses",
+    responses={
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "Statuses have not changed since modified_since",
+        },
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+    },
+)
+async def export_my_statuses(export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+                             modified_since: Optional[datetime] = None,
+                             if_modified_since: Optional[str] = Header(None),
+                             user: User = Depends(current_user)):
+    """
+    Потоково выгружает статусы текущего пользователя в NDJSON или CSV.
+    С modified_since (или заголовком If-Modified-Since) выгружаются только статусы, измененные позже
+
+    :param export_format: формат выгрузки
+    :param modified_since: время предыдущей выгрузки
+    :param if_modified_since: заголовок If-Modified-Since
+    :param user: экземпляр модели User из токена
+    """
+    return await export_user_statuses(user.id, export_format, modified_since, if_modified_since)
+
+
+@statuses_router.get(
+    path="/me/{film_id}",
+    name="statuses:get_my_film_status",
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "description": "The Film status does not exist",
+        },
+    },
+)
+async def get_my_film_status(film_id: int, user: User = Depends(current_user)):
+    """
+    Возвращает статус и рейтинг, который текущий пользователь поставил конкретному фильму
+
+    :param film_id: id фильма
+    :param user: экземпляр модели User из токена
+    """
+    film_status = await db.db_get_film_status(user.id, film_id)
+    if film_status:
+        return film_status
+    else:
+        raise HTTPException(status_code=404,
+                            detail="The film status does not exist")
+
+
+@statuses_router.post(
+    path="/me/{film_id}",
+    response_model=StatusUpdate,
+    name="statuses:create_or_update_my_status",
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "description": "Film does not exist",
+        },
+    },
+)
+async def create_or_update_my_status(film_id: int, film_status: StatusSet, user: User = Depends(current_user)):
+    """
+    Создает/редактирует статус фильма текущего пользователя и возвращает его
+
+    :param film_id: id фильма
+    :param film_status: статус и пользовательский рейтинг фильма от 1 до 10
+    :param user: экземпляр модели User из токена
+    """
+    try:
+        return await create_or_update_cached_status(user.id,
+                                                    film_id,
+                                                    film_status.status,
+                                                    film_status.rating,
+                                                    check_user=False)
+    except FilmNotFound:
+        raise HTTPException(status_code=404,
+                            detail="Film does not exist")
+
+
+# Статусы произвольного пользователя по user_id доступны только суперпользователям
+
+@statuses_router.get(
+    path="/{user_id}/watchlist",
+    response_model=WatchlistPage,
+    dependencies=[Depends(current_superuser)],
+    name="statuses:get_user_watchlist",
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "Not a superuser",
+        },
+    },
+)
+async def get_user_watchlist(user_id: int,
+                             film_status: Optional[StatusEnum] = Query(None, alias="status"),
+                             limit: int = Query(20, gt=0, le=WATCHLIST_MAX_LIMIT),
+                             offset: int = Query(0, ge=0)):
+    """
+    Возвращает страницу статусов пользователя вместе с краткими описаниями фильмов
+
+    :param user_id: id пользователя
+    :param film_status: фильтр по статусу
+    :param limit: размер страницы
+    :param offset: смещение от начала списка
+    """
+    return await get_watchlist_page(user_id, film_status, limit, offset)
+
+
+@statuses_router.get(
+    path="/{user_id}/export",
+    dependencies=[Depends(current_superuser)],
+    name="statuses:export_user_statuses",
+    responses={
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "Statuses have not changed since modified_since",
+        },
+        status.HTTP_401_UNAUTHORIZED: {
+            "description": "Missing token or inactive user",
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "Not a superuser",
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "description": "User does not exist",
+        },
+    },
+)
+async def export_statuses(user_id: int,
+                          export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+                          modified_since: Optional[datetime] = None,
+                          if_modified_since: Optional[str] = Header(None)):
+    """
+    Потоково выгружает статусы пользователя в NDJSON или CSV (например, по запросу GDPR)
+
+    :param user_id: id пользователя
+    :param export_format: формат выгрузки
+    :param modified_since: время предыдущей выгрузки
+    :param if_modified_since: заголовок If-Modified-Since
+    """
+    if not await db.db_get_user_by_id(user_id):
+        raise HTTPException(status_code=404,
+                            detail="User does not exist")
+
+    return await export_user_statuses(user_id, export_format, modified_since, if_modified_since)
+
+
 @statuses_router.get(
     path="/{user_id}/{film_id}",
-    dependencies=[Depends(current_user)],
+    dependencies=[Depends(current_superuser)],
     name="statuses:get_film_status",
     responses={
         status.HTTP_401_UNAUTHORIZED: {
             "description": "Missing token or inactive user",
         },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "Not a superuser",
+        },
         status.HTTP_404_NOT_FOUND: {
             "description": "The Film status does not exist",
         },
@@ -39,12 +362,15 @@ async def get_film_status(user_id: int, film_id: int):
 
 @statuses_router.get(
     path="/{user_id}",
-    dependencies=[Depends(current_user)],
+    dependencies=[Depends(current_superuser)],
     name="statuses:get_user_statuses",
     responses={
         status.HTTP_401_UNAUTHORIZED: {
             "description": "Missing token or inactive user",
         },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "Not a superuser",
+        },
         status.HTTP_404_NOT_FOUND: {
             "description": "User does not exist or has no statuses",
         },
@@ -58,7 +384,7 @@ async def get_user_statuses(user_id: int):
     """
 
     try:
-        user_statuses = await db.db_get_user_statuses(user_id)
+        user_statuses = await get_cached_user_statuses(user_id)
 
         if user_statuses:
             return user_statuses
@@ -73,12 +399,15 @@ async def get_user_statuses(user_id: int):
 
 @statuses_router.get(
     path="/get_user_statuses_by_status/{user_id}/{film_status}",
-    dependencies=[Depends(current_user)],
+    dependencies=[Depends(current_superuser)],
     name="statuses:get_user_statuses_by_status",
     responses={
         status.HTTP_401_UNAUTHORIZED: {
             "description": "Missing token or inactive user",
         },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "Not a superuser",
+        },
         status.HTTP_404_NOT_FOUND: {
             "description": "User does not exist or has no statuses",
         },
@@ -93,7 +422,7 @@ async def get_user_statuses_by_status(user_id: int, film_status: StatusEnum):
     """
 
     try:
-        user_statuses = await db.db_get_user_statuses_by_status(user_id, film_status)
+        user_statuses = await get_cached_user_statuses(user_id, film_status)
 
         if user_statuses:
             return user_statuses
@@ -109,12 +438,15 @@ async def get_user_statuses_by_status(user_id: int, film_status: StatusEnum):
 @statuses_router.post(
     path="/update/{user_id}/{film_id}/{status}/{rating}",
     response_model=StatusUpdate,
-    dependencies=[Depends(current_user)],
-    name="statuses:get_user_statuses",
+    dependencies=[Depends(current_superuser)],
+    name="statuses:create_or_update_status",
     responses={
         status.HTTP_401_UNAUTHORIZED: {
             "description": "Missing token or inactive user",
         },
+        status.HTTP_403_FORBIDDEN: {
+            "description": "Not a superuser",
+        },
         status.HTTP_404_NOT_FOUND: {
             "description": "User or Film does not exist",
         },
@@ -130,13 +462,11 @@ async def create_or_update_status(film_status: StatusUpdate):
     :param rating: пользовательский рейтинг фильма от 1 до 10
     """
 
-    print(current_user)
-
     try:
-        film_status = await db.db_create_or_update_status(film_status.user_id,
-                                                          film_status.film_id,
-                                                          film_status.status,
-                                                          film_status.rating)
+        film_status = await create_or_update_cached_status(film_status.user_id,
+                                                           film_status.film_id,
+                                                           film_status.status,
+                                                           film_status.rating)
         return film_status
     except UserNotFound:
         raise HTTPException(status_code=404,
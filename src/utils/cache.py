@@ -0,0 +1,247 @@
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+from src.utils.logging_util import logging
+
+
+class TTLCache:
+    """
+    Простой in-process кэш с ограничением по времени жизни и размеру записей.
+    При переполнении вытесняются самые давно использованные записи (LRU)
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение по ключу или None, если записи нет или она устарела
+
+        :param key: ключ записи
+        """
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Сохраняет значение в кэш. При ttl <= 0 кэш отключен
+
+        :param key: ключ записи
+        :param value: значение
+        :param ttl: время жизни записи в секундах, по умолчанию self.ttl
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Удаляет запись из кэша
+
+        :param key: ключ записи
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Очищает кэш
+        """
+        self._data.clear()
+
+
+class CacheBackend(ABC):
+    """
+    Интерфейс кэша. Ключи - строки, значения - JSON-совместимые объекты
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Возвращает значение по ключу или None при промахе
+
+        :param key: ключ записи
+        """
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Сохраняет значение
+
+        :param key: ключ записи
+        :param value: значение
+        :param ttl: время жизни записи в секундах, по умолчанию - время жизни бэкенда
+        """
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        """
+        Удаляет записи во всех воркерах
+
+        :param keys: ключи записей
+        """
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    Кэш в памяти процесса. Может хранить любые объекты, в том числе экземпляры моделей.
+    С шиной инвалидации удаление записи рассылается остальным воркерам
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024, bus: Optional["RedisInvalidationBus"] = None):
+        self.local = TTLCache(ttl=ttl, maxsize=maxsize)
+        self.bus = bus
+        if bus is not None:
+            bus.register(self)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self.local.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.local.set(key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.local.invalidate(key)
+        if self.bus is not None:
+            await self.bus.publish(*keys)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Кэш в Redis (или совместимом сервере), общий для всех воркеров
+
+    :param client: клиент redis.asyncio.Redis или совместимый (например, fakeredis.FakeAsyncRedis)
+    :param ttl: время жизни записей по умолчанию в секундах
+    :param prefix: префикс ключей сервиса
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "posmotrim:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        await self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+
+class RedisInvalidationBus:
+    """
+    Рассылка инвалидаций локальных кэшей между воркерами через Redis pub/sub
+
+    :param client: клиент redis.asyncio.Redis или совместимый
+    :param channel: канал pub/sub
+    """
+
+    def __init__(self, client, channel: str = "posmotrim:cache-invalidation"):
+        self.client = client
+        self.channel = channel
+        self.backends: List[InMemoryCacheBackend] = []
+        self.closed = False
+
+    def register(self, backend: InMemoryCacheBackend) -> None:
+        """
+        Подписывает локальный кэш на инвалидации из других воркеров
+
+        :param backend: локальный кэш
+        """
+        self.backends.append(backend)
+
+    async def publish(self, *keys: str) -> None:
+        """
+        Сообщает остальным воркерам об удаленных ключах
+
+        :param keys: ключи записей
+        """
+        if keys:
+            await self.client.publish(self.channel, json.dumps(keys))
+
+    async def listen(self, retry_delay: float = 1, max_retry_delay: float = 30, poll_interval: float = 1) -> None:
+        """
+        Слушает канал и удаляет пришедшие ключи из локальных кэшей. Запускается задачей при старте воркера.
+        При потере соединения переподключается с растущей задержкой и очищает локальные кэши:
+        инвалидации, отправленные за время разрыва, потеряны
+
+        :param retry_delay: начальная задержка переподключения в секундах
+        :param max_retry_delay: максимальная задержка переподключения в секундах
+        :param poll_interval: как часто проверяется остановка (close) в секундах
+        """
+        delay = retry_delay
+        reconnect = False
+        while not self.closed:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    if reconnect:
+                        logging.warning(f"Подписка на канал {self.channel} восстановлена, локальные кэши очищены")
+                        for backend in self.backends:
+                            backend.local.clear()
+                    delay = retry_delay
+                    # Опрос с таймаутом вместо pubsub.listen(): redis-py теряет отмену задачи, пришедшую
+                    # одновременно с сообщением, и без проверки close остановка ждала бы следующего сообщения
+                    while not self.closed:
+                        message = await pubsub.get_message(timeout=poll_interval)
+                        if message is not None:
+                            self.handle(message)
+            except Exception:
+                logging.exception(f"Потеряно соединение с каналом {self.channel}, повтор через {delay:g} с")
+            if self.closed:
+                return
+            reconnect = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_retry_delay)
+
+    def close(self) -> None:
+        """
+        Останавливает listen не позже чем через poll_interval
+        """
+        self.closed = True
+
+    def handle(self, message: dict) -> None:
+        """
+        Удаляет из локальных кэшей ключи из сообщения канала
+
+        :param message: сообщение pub/sub
+        """
+        if message["type"] != "message":
+            return
+        try:
+            keys = json.loads(message["data"])
+        except ValueError:
+            logging.warning(f"Некорректное сообщение в канале {self.channel}: {message['data']!r}")
+            return
+        for backend in self.backends:
+            for key in keys:
+                backend.local.invalidate(key)
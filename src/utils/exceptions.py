@@ -8,3 +8,7 @@ class FilmNotFound(Exception):
 
 class StatusesNotFound(Exception):
     pass
+
+
+class SchemaVersionMismatch(Exception):
+    pass
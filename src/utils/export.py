@@ -0,0 +1,99 @@
+import io
+import csv
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from src.app.models import Base
+from src.app.schemas import ExportFormat
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: 'application/x-ndjson',
+    ExportFormat.csv: 'text/csv; charset=utf-8',
+}
+
+
+def get_columns(model: type[Base]) -> List[str]:
+    """
+    Возвращает имена колонок модели в порядке объявления
+
+    :param model: модель SQLAlchemy
+    """
+    return [column.key for column in model.__table__.columns]
+
+
+def get_modified_since(modified_since: Optional[datetime],
+                       if_modified_since: Optional[str]) -> Tuple[Optional[datetime], bool]:
+    """
+    Возвращает момент, после которого нужны изменения: из параметра запроса или заголовка If-Modified-Since.
+    Вторым элементом - True, если момент взят из заголовка и поэтому известен с точностью до секунды
+
+    :param modified_since: параметр запроса
+    :param if_modified_since: заголовок If-Modified-Since (HTTP-дата)
+    """
+    if modified_since is not None:
+        return (modified_since if modified_since.tzinfo else modified_since.replace(tzinfo=timezone.utc)), False
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None, False
+        # Зона "-0000" дает наивное время, считаем его UTC
+        return (since if since.tzinfo else since.replace(tzinfo=timezone.utc)), True
+    return None, False
+
+
+async def ndjson_lines(batches: AsyncIterator[Sequence[Base]], columns: List[str]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        rows = jsonable_encoder([{column: getattr(obj, column) for column in columns} for obj in batch])
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode()
+
+
+async def csv_lines(batches: AsyncIterator[Sequence[Base]], columns: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        rows = jsonable_encoder([{column: getattr(obj, column) for column in columns} for obj in batch])
+        # Списки (жанры, похожие фильмы) записываются в ячейку как JSON
+        writer.writerows([json.dumps(value) if isinstance(value, list) else value for value in row.values()]
+                         for row in rows)
+        yield buffer.getvalue().encode()
+
+
+def export_response(batches: AsyncIterator[Sequence[Base]], model: type[Base], export_format: ExportFormat,
+                    last_modified: Optional[datetime], modified_since: Optional[datetime],
+                    filename: str, whole_seconds: bool = False) -> Response:
+    """
+    Возвращает потоковую выгрузку строк в NDJSON или CSV. Строки сериализуются по мере чтения пачек из БД.
+    Если после modified_since ничего не менялось, возвращает 304 без обращения к batches
+
+    :param batches: асинхронный генератор пачек экземпляров модели
+    :param model: модель SQLAlchemy - задает колонки выгрузки
+    :param export_format: формат выгрузки
+    :param last_modified: время последнего изменения выгружаемых данных
+    :param modified_since: время предыдущей выгрузки
+    :param filename: имя файла без расширения
+    :param whole_seconds: modified_since взят из HTTP-даты и известен с точностью до секунды
+    """
+    headers = {}
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+        # HTTP-дата с точностью до секунды, параметр modified_since сравнивается с полной точностью
+        compared = last_modified.replace(microsecond=0) if whole_seconds else last_modified
+        if modified_since is not None and compared <= modified_since:
+            return Response(status_code=304, headers=headers)
+
+    headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format.value}"'
+    columns = get_columns(model)
+    lines = ndjson_lines(batches, columns) if export_format == ExportFormat.ndjson else csv_lines(batches, columns)
+    return StreamingResponse(lines, media_type=MEDIA_TYPES[export_format], headers=headers)
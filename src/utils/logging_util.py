@@ -1,12 +1,180 @@
-import os
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
 import logging
+from contextvars import ContextVar
+from typing import Optional, Tuple
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-log_dir = os.path.normpath(os.getcwd() + os.sep + os.pardir)
-log_filename = os.path.join(log_dir, 'app.log')
+from src.config import LOG_LEVEL, LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ACCESS_SAMPLE_RATE
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s',
-                    handlers=[
-                        logging.FileHandler(log_filename),
-                        logging.StreamHandler()
-                    ]
-                    )
+# Контекст текущего запроса: id запроса и ASGI scope (из него берется имя маршрута)
+request_context: ContextVar[Optional[dict]] = ContextVar('request_context', default=None)
+
+access_logger = logging.getLogger('posmotrim.access')
+
+# Атрибуты, которые есть у любой записи logging и не попадают в JSON как дополнительные поля
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Добавляет в запись id запроса и имя маршрута. Вызывается в потоке, который пишет лог
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = request_context.get()
+        if context is not None:
+            route = context['scope'].get('route')
+            record.request_id = context['request_id']
+            record.route = getattr(route, 'name', None)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает долю rate записей уровня INFO и ниже. Предупреждения и ошибки пропускаются всегда
+
+    :param rate: доля записей от 0 до 1
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись в одну JSON-строку
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        # После очереди (StructuredQueueHandler) трейсбек уже переведен в текст exc_text
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись перед постановкой в очередь. Стандартный prepare
+    склеивает сообщение с трейсбеком, и JsonFormatter не может вынести трейсбек в отдельное поле
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Аргументы подставляются сразу, а трейсбек переводится в текст: объекты из них могут измениться
+        # или удерживать кадры стека, пока запись ждет в очереди
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def create_file_handler(filename: str) -> RotatingFileHandler:
+    """
+    Возвращает обработчик, пишущий JSON-записи в файл с ротацией по размеру
+
+    :param filename: путь к файлу лога
+    """
+    handler = RotatingFileHandler(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def create_queue_handler(*handlers: logging.Handler) -> Tuple[QueueHandler, QueueListener]:
+    """
+    Возвращает обработчик, который только кладет запись в очередь, и слушатель очереди,
+    передающий записи в handlers в отдельном потоке. Слушатель нужно запустить
+
+    :param handlers: обработчики, выполняющие ввод-вывод
+    """
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    return queue_handler, listener
+
+
+def setup_logging() -> None:
+    """
+    Настраивает корневой логгер: запись в файл и консоль выполняется в фоновом потоке,
+    поэтому вызовы логгера не блокируют event loop. Повторные вызовы ничего не делают
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, QueueHandler) for handler in root.handlers):
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler, listener = create_queue_handler(create_file_handler(LOG_FILE), stream_handler)
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+    access_logger.addFilter(SamplingFilter(LOG_ACCESS_SAMPLE_RATE))
+
+    listener.start()
+    atexit.register(listener.stop)
+
+
+class AccessLogMiddleware:
+    """
+    ASGI middleware: присваивает запросу id (или берет из заголовка X-Request-ID),
+    возвращает его в ответе и пишет в access-лог маршрут, код ответа и латентность
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope['headers'])
+        request_id = headers.get(b'x-request-id', b'').decode('latin-1') or uuid.uuid4().hex
+        token = request_context.set({'request_id': request_id, 'scope': scope})
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                message['headers'] = list(message.get('headers', [])) + [(b'x-request-id', request_id.encode('latin-1'))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            access_logger.log(
+                logging.WARNING if status_code >= 500 else logging.INFO,
+                '%s %s %s', scope['method'], scope['path'], status_code,
+                extra={'status_code': status_code, 'latency_ms': round((time.perf_counter() - started) * 1000, 3)},
+            )
+            request_context.reset(token)
+
+
+setup_logging()
@@ -0,0 +1,148 @@
+import json
+import math
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Корзина токенов: пополняется со скоростью rate токенов в секунду до capacity
+
+    :param rate: скорость пополнения, токенов в секунду
+    :param capacity: максимальное количество токенов (допустимый всплеск запросов)
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self) -> float:
+        """
+        Забирает один токен. Возвращает 0, если токен был, иначе - сколько секунд ждать следующего
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов по корзинам токенов в разрезе маршрута и клиента.
+    Корзины хранятся в памяти воркера, давно не использованные вытесняются
+
+    :param limits: лимиты маршрутов {имя маршрута: (токенов в секунду, размер всплеска)}
+    :param default: лимит для маршрутов, которых нет в limits; None - без ограничения
+    :param maxsize: максимальное количество корзин
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], default: Optional[Tuple[float, float]] = None,
+                 maxsize: int = 100000):
+        self.limits = limits
+        self.default = default
+        self.maxsize = maxsize
+        self.buckets: OrderedDict[Tuple[str, str], TokenBucket] = OrderedDict()
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {'allowed': 0, 'limited': 0})
+
+    def check(self, route: str, key: str) -> float:
+        """
+        Учитывает запрос клиента key к маршруту route.
+        Возвращает 0, если запрос разрешен, иначе - через сколько секунд повторить
+
+        :param route: имя маршрута
+        :param key: ключ клиента (id пользователя или IP)
+        """
+        limit = self.limits.get(route, self.default)
+        if limit is None:
+            return 0
+
+        bucket = self.buckets.get((route, key))
+        if bucket is None:
+            bucket = self.buckets[(route, key)] = TokenBucket(*limit)
+            while len(self.buckets) > self.maxsize:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end((route, key))
+
+        retry_after = bucket.consume()
+        self.counters[route]['limited' if retry_after else 'allowed'] += 1
+        return retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Счетчики одновременных запросов воркера
+
+    :param max_concurrent: максимум одновременных запросов
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.counters = {'accepted': 0, 'shed': 0}
+
+    def stats(self) -> dict:
+        return {'max_concurrent': self.max_concurrent, 'in_flight': self.in_flight, **self.counters}
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    ASGI middleware: не более limiter.max_concurrent одновременных HTTP-запросов на воркер.
+    Лишние запросы сразу получают 503 вместо ожидания соединения из пула БД
+    """
+
+    def __init__(self, app, limiter: ConcurrencyLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiter
+        if limiter.in_flight >= limiter.max_concurrent:
+            limiter.counters['shed'] += 1
+            await send_error(send, 503, 'Server is overloaded, try again later', retry_after=1)
+            return
+
+        limiter.counters['accepted'] += 1
+        limiter.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.in_flight -= 1
+
+
+async def send_error(send, status_code: int, detail: str, retry_after: float) -> None:
+    """
+    Отправляет JSON-ответ с ошибкой в формате HTTPException и заголовком Retry-After
+    """
+    body = json.dumps({'detail': detail}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'retry-after', str(math.ceil(retry_after)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def parse_limit(value: str) -> Tuple[float, float]:
+    """
+    Разбирает лимит вида 'токенов_в_секунду/всплеск', например '5/10'
+
+    :param value: строка лимита
+    """
+    rate, capacity = value.split('/')
+    return float(rate), float(capacity)
@@ -0,0 +1,117 @@
+"""
+Общие фикстуры тестов. Модульные тесты работают без БД: слой данных - InMemoryRepository,
+хранилище пользователей fastapi-users - InMemoryUserDatabase, запросы идут в приложение через ASGITransport
+"""
+import os
+
+# Настройки читаются при импорте src.config, поэтому задаются до импорта приложения
+os.environ.setdefault("SECRET", "test-secret-with-at-least-32-bytes")
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+os.environ.setdefault("EXPORT_SETTLE_SECONDS", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["RATE_LIMIT_DEFAULT"] = "20/40"
+os.environ["RATE_LIMITS"] = "statuses:create_or_update_my_status=5/10"
+os.environ["WEB_CONCURRENCY"] = "1"
+os.environ.pop("REDIS_URL", None)
+os.environ.pop("DB_REPLICA_HOSTS", None)
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from src.app import db  # noqa: E402
+from src.app.app import app  # noqa: E402
+from src.app.cache import cache, user_cache  # noqa: E402
+from src.app.limits import rate_limiter  # noqa: E402
+from src.app.models import Film  # noqa: E402
+from src.app.repository import InMemoryRepository, InMemoryUserDatabase  # noqa: E402
+
+PASSWORD = "password123"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def repository():
+    """
+    Пустой InMemoryRepository, подставленный вместо слоя данных. Кэши и лимиты сбрасываются
+    """
+    repository = InMemoryRepository()
+    previous = db.repository
+    db.set_repository(repository)
+    cache.local.clear()
+    user_cache.local.clear()
+    rate_limiter.buckets.clear()
+    yield repository
+    db.set_repository(previous)
+
+
+@pytest.fixture
+def films(repository):
+    """
+    Три фильма: два в жанре "драма", один в жанре "комедия"
+    """
+    return [
+        repository.add_film(Film(kinopoisk_id=1, name="Фильм 1", genres=["драма"], rating_imdb=7.5, year=2001,
+                                 film_length=120, close_film_ids=[2, 3])),
+        repository.add_film(Film(kinopoisk_id=2, name="Фильм 2", genres=["драма", "комедия"], rating_imdb=8.5,
+                                 year=2002, film_length=95, close_film_ids=[1])),
+        repository.add_film(Film(kinopoisk_id=3, name="Фильм 3", genres=["комедия"], rating_imdb=6.0, year=2003,
+                                 film_length=100, close_film_ids=[])),
+    ]
+
+
+@pytest.fixture
+async def client(repository):
+    async def get_user_db():
+        yield InMemoryUserDatabase(repository)
+
+    app.dependency_overrides[db.get_user_db] = get_user_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def register(client: httpx.AsyncClient, email: str, password: str = PASSWORD) -> dict:
+    """
+    Регистрирует пользователя и возвращает его данные из ответа
+    """
+    response = await client.post("/auth/register", json={
+        "email": email,
+        "password": password,
+        "username": email.split("@")[0],
+        "birthday": "2000-01-01T00:00:00+00:00",
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str = PASSWORD) -> dict:
+    """
+    Входит пользователем и возвращает заголовки с его JWT
+    """
+    response = await client.post("/auth/jwt/login", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+async def user(client):
+    """
+    Зарегистрированный пользователь: данные и заголовки авторизации
+    """
+    data = await register(client, "user@example.com")
+    return data, await login(client, "user@example.com")
+
+
+@pytest.fixture
+async def superuser(client, repository):
+    """
+    Зарегистрированный суперпользователь: данные и заголовки авторизации
+    """
+    data = await register(client, "admin@example.com")
+    repository.users[data["id"]].is_superuser = True
+    return data, await login(client, "admin@example.com")
@@ -0,0 +1,123 @@
+import pytest
+
+from src.app.schemas import StatusEnum, RatingEnum
+from src.utils.exceptions import FilmNotFound, UserNotFound
+from tests.integration.conftest import requires_database
+
+pytestmark = [pytest.mark.anyio, requires_database]
+
+
+async def collect(batches) -> list:
+    return [[item for item in batch] async for batch in batches]
+
+
+async def test_top_films_by_genre(sql_repository, seeded):
+    # ARRAY.contains ищет жанр целиком, "драматический" не подходит
+    films = await sql_repository.get_top_films_by_genre("драма", 10)
+    assert [film.kinopoisk_id for film in films] == [2, 1, 5]
+
+    films = await sql_repository.get_top_films_by_genre("драма", 2)
+    assert [film.kinopoisk_id for film in films] == [2, 1]
+
+    assert sorted(await sql_repository.get_genres()) == ["драма", "драматический", "комедия"]
+
+
+async def test_film_and_recommendations(sql_repository, seeded):
+    assert (await sql_repository.get_film(1)).name == "Фильм 1"
+    with pytest.raises(FilmNotFound):
+        await sql_repository.get_film(404)
+
+    films = await sql_repository.get_film_recommendations(1)
+    assert sorted(film.kinopoisk_id for film in films) == [2, 3]
+
+
+async def test_create_or_update_status_writes_outbox(sql_repository, seeded):
+    user_id, _ = seeded
+    created = await sql_repository.create_or_update_status(user_id, 1, StatusEnum.watching, RatingEnum.six)
+    updated = await sql_repository.create_or_update_status(user_id, 1, StatusEnum.watched, RatingEnum.eight)
+    assert updated.id == created.id
+    assert updated.updated_at >= created.updated_at
+
+    status = await sql_repository.get_film_status(user_id, 1)
+    assert (status.status, status.rating) == (StatusEnum.watched, RatingEnum.eight)
+
+    events = [event for batch in await collect(sql_repository.stream_status_events(0, 10, 0)) for event in batch]
+    assert [(event.status_id, event.status, event.previous_status) for event in events] == [
+        (created.id, StatusEnum.watching, None),
+        (created.id, StatusEnum.watched, StatusEnum.watching),
+    ]
+    assert (await collect(sql_repository.stream_status_events(events[0].id, 10, 0)))[0][0].id == events[1].id
+    # Свежие события придерживаются на settle_seconds
+    assert await collect(sql_repository.stream_status_events(0, 10, 3600)) == []
+
+
+async def test_create_status_checks_user_and_film(sql_repository, seeded):
+    user_id, _ = seeded
+    with pytest.raises(UserNotFound):
+        await sql_repository.create_or_update_status(404, 1, StatusEnum.plan, None)
+    with pytest.raises(FilmNotFound):
+        await sql_repository.create_or_update_status(user_id, 404, StatusEnum.plan, None)
+
+
+async def test_user_statuses(sql_repository, seeded):
+    user_id, other_id = seeded
+    await sql_repository.create_or_update_status(user_id, 1, StatusEnum.watched, RatingEnum.eight)
+    await sql_repository.create_or_update_status(user_id, 2, StatusEnum.plan, None)
+    await sql_repository.create_or_update_status(other_id, 3, StatusEnum.plan, None)
+
+    assert sorted(s.film_id for s in await sql_repository.get_user_statuses(user_id)) == [1, 2]
+    statuses = await sql_repository.get_user_statuses_by_status(user_id, StatusEnum.plan)
+    assert [s.film_id for s in statuses] == [2]
+    with pytest.raises(UserNotFound):
+        await sql_repository.get_user_statuses(404)
+
+
+async def test_watchlist_window_count(sql_repository, seeded):
+    user_id, other_id = seeded
+    for film_id in (1, 2, 3, 4):
+        await sql_repository.create_or_update_status(user_id, film_id, StatusEnum.watched, None)
+    await sql_repository.create_or_update_status(user_id, 2, StatusEnum.watching, None)
+    await sql_repository.create_or_update_status(other_id, 5, StatusEnum.watched, None)
+
+    items, total = await sql_repository.get_user_watchlist(user_id, None, 2, 0)
+    assert total == 4
+    # Фильм загружен тем же запросом и доступен после закрытия сессии
+    assert [(item.film_id, item.film.name) for item in items] == [(2, "Фильм 2"), (4, "Фильм 4")]
+
+    items, total = await sql_repository.get_user_watchlist(user_id, None, 2, 2)
+    assert (total, [item.film_id for item in items]) == (4, [3, 1])
+
+    items, total = await sql_repository.get_user_watchlist(user_id, StatusEnum.watched, 10, 0)
+    assert (total, [item.film_id for item in items]) == (3, [4, 3, 1])
+
+    assert await sql_repository.get_user_watchlist(user_id, None, 10, 10) == ([], 4)
+
+
+async def test_stream_films(sql_repository, seeded):
+    batches = await collect(sql_repository.stream_films(None, 2, 0))
+    assert [[film.kinopoisk_id for film in batch] for batch in batches] == [[1, 2], [3, 4], [5]]
+
+    last_modified = await sql_repository.get_films_last_modified(0)
+    assert last_modified is not None
+    assert await collect(sql_repository.stream_films(last_modified, 2, 0)) == []
+    # Изменения моложе settle_seconds не выгружаются
+    assert await collect(sql_repository.stream_films(None, 2, 3600)) == []
+    assert await sql_repository.get_films_last_modified(3600) is None
+
+
+async def test_stream_user_statuses(sql_repository, seeded):
+    user_id, other_id = seeded
+    first = await sql_repository.create_or_update_status(user_id, 1, StatusEnum.watched, None)
+    await sql_repository.create_or_update_status(user_id, 2, StatusEnum.watched, None)
+    await sql_repository.create_or_update_status(user_id, 3, StatusEnum.watched, None)
+    await sql_repository.create_or_update_status(other_id, 1, StatusEnum.watched, None)
+
+    batches = await collect(sql_repository.stream_user_statuses(user_id, None, 2, 0))
+    assert [[status.film_id for status in batch] for batch in batches] == [[1, 2], [3]]
+
+    batches = await collect(sql_repository.stream_user_statuses(user_id, first.updated_at, 10, 0))
+    assert [status.film_id for status in batches[0]] == [2, 3]
+
+    last_modified = await sql_repository.get_user_statuses_last_modified(user_id, 0)
+    assert await collect(sql_repository.stream_user_statuses(user_id, last_modified, 10, 0)) == []
+    assert await sql_repository.get_user_watchlist(user_id, StatusEnum.watched, 10, 10) == ([], 3)
@@ -0,0 +1,62 @@
+import pytest
+from fastapi_users.jwt import generate_jwt
+
+from src.config import SECRET
+from tests.conftest import PASSWORD, login, register
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_register_and_login(client):
+    data = await register(client, "new@example.com")
+    headers = await login(client, "new@example.com")
+
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == data["id"]
+    assert response.json()["username"] == "new"
+
+
+async def test_register_twice(client):
+    await register(client, "twice@example.com")
+    response = await client.post("/auth/register", json={
+        "email": "twice@example.com",
+        "password": PASSWORD,
+        "username": "twice",
+        "birthday": "2000-01-01T00:00:00+00:00",
+    })
+    assert response.status_code == 400
+
+
+async def test_register_too_long_password(client):
+    response = await client.post("/auth/register", json={
+        "email": "long@example.com",
+        "password": "я" * 40,
+        "username": "long",
+        "birthday": "2000-01-01T00:00:00+00:00",
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"]["code"] == "REGISTER_INVALID_PASSWORD"
+
+
+async def test_login_wrong_password(client):
+    await register(client, "wrong@example.com")
+    response = await client.post("/auth/jwt/login", data={"username": "wrong@example.com", "password": "nope"})
+    assert response.status_code == 400
+
+
+async def test_missing_or_invalid_token(client):
+    assert (await client.get("/statuses/me")).status_code == 401
+    assert (await client.get("/statuses/me", headers={"Authorization": "Bearer invalid"})).status_code == 401
+
+
+async def test_inactive_user(client, repository, user):
+    data, headers = user
+    repository.users[data["id"]].is_active = False
+    assert (await client.get("/users/me", headers=headers)).status_code == 401
+
+
+async def test_token_without_subject(client):
+    token = generate_jwt({"aud": ["fastapi-users:auth"]}, SECRET, lifetime_seconds=60)
+    response = await client.get("/statuses/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
@@ -0,0 +1,151 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from src.app import cache as app_cache
+from src.utils.cache import InMemoryCacheBackend, RedisCacheBackend, RedisInvalidationBus
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def redis_client(server):
+    return fakeredis.FakeAsyncRedis(server=server)
+
+
+async def wait_for(condition, timeout: float = 1) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition was not met in time"
+        await asyncio.sleep(0.01)
+
+
+async def stop(bus: RedisInvalidationBus, listener: asyncio.Task) -> None:
+    bus.close()
+    listener.cancel()
+    try:
+        await listener
+    except asyncio.CancelledError:
+        pass
+
+
+async def test_redis_backend_roundtrip(server):
+    client = redis_client(server)
+    backend = RedisCacheBackend(client, ttl=60)
+
+    await backend.set("film:1", {"name": "Фильм", "genres": ["драма"]})
+    assert await backend.get("film:1") == {"name": "Фильм", "genres": ["драма"]}
+    assert await client.exists("posmotrim:film:1")
+    assert await backend.get("film:2") is None
+
+    await backend.delete("film:1", "film:2")
+    assert await backend.get("film:1") is None
+
+
+async def test_redis_backend_ttl(server):
+    client = redis_client(server)
+    backend = RedisCacheBackend(client, ttl=60)
+
+    await backend.set("default", 1)
+    assert 59000 < await client.pttl("posmotrim:default") <= 60000
+
+    await backend.set("short", 1, ttl=0.5)
+    assert 0 < await client.pttl("posmotrim:short") <= 500
+
+    # Нулевое время жизни отключает кэширование
+    await backend.set("disabled", 1, ttl=0)
+    assert await backend.get("disabled") is None
+
+
+async def test_invalidation_between_workers(server):
+    first_bus = RedisInvalidationBus(redis_client(server))
+    second_bus = RedisInvalidationBus(redis_client(server))
+    first = InMemoryCacheBackend(ttl=60, bus=first_bus)
+    second = InMemoryCacheBackend(ttl=60, bus=second_bus)
+
+    listener = asyncio.create_task(second_bus.listen(poll_interval=0.01))
+    try:
+        await second.set("user_statuses:1", ["old"])
+        await second.set("user_statuses:2", ["other"])
+        # Подписка устанавливается асинхронно: публикуем, пока сообщение не дойдет
+        for _ in range(100):
+            await first.delete("user_statuses:1")
+            if await second.get("user_statuses:1") is None:
+                break
+            await asyncio.sleep(0.01)
+
+        assert await second.get("user_statuses:1") is None
+        assert await second.get("user_statuses:2") == ["other"]
+    finally:
+        await stop(second_bus, listener)
+
+
+async def test_listener_reconnects_and_clears_local_caches(server):
+    client = redis_client(server)
+    bus = RedisInvalidationBus(client)
+    backend = InMemoryCacheBackend(ttl=60, bus=bus)
+    await backend.set("film:1", {"name": "Фильм"})
+
+    connect = client.pubsub
+    attempts = []
+
+    def flaky_pubsub():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("connection lost")
+        return connect()
+
+    client.pubsub = flaky_pubsub
+    listener = asyncio.create_task(bus.listen(retry_delay=0.01, poll_interval=0.01))
+    try:
+        await wait_for(lambda: len(attempts) >= 2 and backend.local.get("film:1") is None)
+
+        # После переподключения инвалидации снова принимаются
+        await backend.set("film:2", {"name": "Фильм 2"})
+        for _ in range(100):
+            await bus.publish("film:2")
+            if backend.local.get("film:2") is None:
+                break
+            await asyncio.sleep(0.01)
+        assert backend.local.get("film:2") is None
+    finally:
+        await stop(bus, listener)
+
+
+def test_handle_ignores_malformed_messages():
+    bus = RedisInvalidationBus(client=None)
+    backend = InMemoryCacheBackend(ttl=60, bus=bus)
+    backend.local.set("film:1", 1)
+
+    bus.handle({"type": "subscribe", "data": 1})
+    bus.handle({"type": "message", "data": b"not json"})
+    assert backend.local.get("film:1") == 1
+
+    bus.handle({"type": "message", "data": b'["film:1"]'})
+    assert backend.local.get("film:1") is None
+
+
+@pytest.mark.parametrize("redis_url,cache_ttl,user_cache_ttl,allowed", [
+    (None, 300, 30, False),
+    (None, 0, 30, False),
+    (None, 300, 0, False),
+    (None, 0, 0, True),
+    ("redis://localhost:6379/0", 300, 30, True),
+])
+def test_check_cache_for_workers(monkeypatch, redis_url, cache_ttl, user_cache_ttl, allowed):
+    monkeypatch.setattr(app_cache, "REDIS_URL", redis_url)
+    monkeypatch.setattr(app_cache, "CACHE_TTL", cache_ttl)
+    monkeypatch.setattr(app_cache, "USER_CACHE_TTL", user_cache_ttl)
+
+    app_cache.check_cache_for_workers(1)
+    if allowed:
+        app_cache.check_cache_for_workers(4)
+    else:
+        with pytest.raises(Exception, match="REDIS_URL"):
+            app_cache.check_cache_for_workers(4)
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def read_ndjson(text: str) -> list:
+    return [json.loads(line) for line in text.splitlines()]
+
+
+async def test_export_my_statuses(client, films, user):
+    _, headers = user
+    await client.post("/statuses/me/1", headers=headers, json={"status": "Посмотрел", "rating": 8})
+    await client.post("/statuses/me/2", headers=headers, json={"status": "Смотрю", "rating": None})
+
+    response = await client.get("/statuses/me/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "last-modified" in response.headers
+    assert sorted(row["film_id"] for row in read_ndjson(response.text)) == [1, 2]
+
+    response = await client.get("/statuses/me/export", headers=headers, params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["film_id"] for row in rows] == ["1", "2"]
+    assert rows[1]["rating"] == ""
+
+
+async def test_export_incremental(client, repository, films, user):
+    _, headers = user
+    await client.post("/statuses/me/1", headers=headers, json={"status": "Посмотрел", "rating": 8})
+    since = repository.statuses[1].updated_at.isoformat()
+
+    response = await client.get("/statuses/me/export", headers=headers, params={"modified_since": since})
+    assert response.status_code == 304
+
+    # Изменение в ту же секунду не теряется: modified_since сравнивается с полной точностью
+    await client.post("/statuses/me/2", headers=headers, json={"status": "Смотрю", "rating": 5})
+    response = await client.get("/statuses/me/export", headers=headers, params={"modified_since": since})
+    assert response.status_code == 200
+    assert [row["film_id"] for row in read_ndjson(response.text)] == [2]
+
+    last_modified = response.headers["last-modified"]
+    response = await client.get("/statuses/me/export", headers={**headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+
+async def test_export_naive_if_modified_since(client, films, user):
+    _, headers = user
+    await client.post("/statuses/me/1", headers=headers, json={"status": "Посмотрел", "rating": 8})
+
+    # Зона "-0000" разбирается в наивное время
+    response = await client.get("/statuses/me/export",
+                                headers={**headers, "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 -0000"})
+    assert response.status_code == 200
+    assert [row["film_id"] for row in read_ndjson(response.text)] == [1]
+
+
+async def test_export_settle_window(client, repository, films, user, monkeypatch):
+    from src.routers import statuses
+
+    _, headers = user
+    monkeypatch.setattr(statuses, "EXPORT_SETTLE_SECONDS", 60)
+    await client.post("/statuses/me/1", headers=headers, json={"status": "Посмотрел", "rating": 8})
+
+    response = await client.get("/statuses/me/export", headers=headers)
+    assert response.status_code == 200
+    assert response.text == ""
+    assert "last-modified" not in response.headers
+
+
+async def test_export_films(client, films, superuser):
+    _, headers = superuser
+    response = await client.get("/films/export", headers=headers)
+    assert response.status_code == 200
+    rows = read_ndjson(response.text)
+    assert [row["kinopoisk_id"] for row in rows] == [1, 2, 3]
+    assert rows[1]["genres"] == ["драма", "комедия"]
+
+    response = await client.get("/films/export", headers=headers, params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert json.loads(rows[1]["genres"]) == ["драма", "комедия"]
+
+
+async def test_export_missing_user(client, superuser):
+    _, headers = superuser
+    assert (await client.get("/statuses/404/export", headers=headers)).status_code == 404
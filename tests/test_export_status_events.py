@@ -0,0 +1,72 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from src.app.models import User
+from src.app.schemas import StatusEnum, RatingEnum
+from src.data.export_status_events import STATE_FILENAME, export_status_events
+
+pytestmark = pytest.mark.anyio
+
+
+def read_events(path: str) -> list:
+    if path.endswith(".ndjson.gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    assert str(table.schema.field("created_at").type) == "timestamp[us, tz=UTC]"
+    return table.to_pylist()
+
+
+def exported_files(output_dir: str) -> list:
+    return sorted(name for name in os.listdir(output_dir) if name != STATE_FILENAME)
+
+
+def read_state(output_dir: str) -> int:
+    with open(os.path.join(output_dir, STATE_FILENAME)) as f:
+        return int(f.read())
+
+
+@pytest.mark.parametrize("export_format,extension", [("ndjson", "ndjson.gz"), ("parquet", "parquet")])
+async def test_incremental_export(repository, films, tmp_path, export_format, extension):
+    if export_format == "parquet":
+        pytest.importorskip("pyarrow")
+
+    output_dir = str(tmp_path)
+    user = repository.add_user(User(email="user@example.com", hashed_password="x", username="user",
+                                    birthday=datetime(2000, 1, 1)))
+    await repository.create_or_update_status(user.id, 1, StatusEnum.plan, None)
+    await repository.create_or_update_status(user.id, 2, StatusEnum.watching, RatingEnum.six)
+    await repository.create_or_update_status(user.id, 1, StatusEnum.watched, RatingEnum.eight)
+
+    # Свежие события придерживаются
+    await export_status_events(output_dir, export_format, batch_size=2, settle_seconds=3600)
+    assert os.listdir(output_dir) == []
+
+    await export_status_events(output_dir, export_format, batch_size=2, settle_seconds=0)
+    assert exported_files(output_dir) == [f"status_events_1-3.{extension}"]
+    assert read_state(output_dir) == 3
+
+    events = read_events(os.path.join(output_dir, f"status_events_1-3.{extension}"))
+    assert [event["id"] for event in events] == [1, 2, 3]
+    assert events[2]["status"] == "watched"
+    assert events[2]["rating"] == 8
+    assert events[2]["previous_status"] == "plan"
+    assert events[2]["previous_rating"] is None
+
+    await repository.create_or_update_status(user.id, 3, StatusEnum.quit, RatingEnum.two)
+    await export_status_events(output_dir, export_format, batch_size=2, settle_seconds=0)
+    assert exported_files(output_dir) == [f"status_events_1-3.{extension}", f"status_events_4-4.{extension}"]
+    assert read_state(output_dir) == 4
+    assert [event["film_id"] for event in read_events(os.path.join(output_dir, f"status_events_4-4.{extension}"))] == [3]
+
+    # Без новых событий файлы и состояние не меняются
+    await export_status_events(output_dir, export_format, batch_size=2, settle_seconds=0)
+    assert len(exported_files(output_dir)) == 2
+    assert read_state(output_dir) == 4
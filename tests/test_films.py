@@ -0,0 +1,30 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_get_film(client, films):
+    response = await client.get("/films/1")
+    assert response.status_code == 200
+    assert response.json()["name"] == "Фильм 1"
+
+
+async def test_get_missing_film(client, films):
+    assert (await client.get("/films/404")).status_code == 404
+
+
+async def test_top_films_by_genre(client, films):
+    response = await client.get("/films/top_films_by_genre/драма/10")
+    assert response.status_code == 200
+    assert [film["kinopoisk_id"] for film in response.json()] == [2, 1]
+
+    response = await client.get("/films/top_films_by_genre/драма/1")
+    assert [film["kinopoisk_id"] for film in response.json()] == [2]
+
+
+async def test_film_recommendations(client, films):
+    response = await client.get("/films/1/recommendations")
+    assert response.status_code == 200
+    assert sorted(film["kinopoisk_id"] for film in response.json()) == [2, 3]
+
+    assert (await client.get("/films/404/recommendations")).status_code == 404
@@ -0,0 +1,35 @@
+import pytest
+
+from tests.conftest import login, register
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_rate_limit_per_user(client, films, user):
+    _, headers = user
+    codes = [(await client.post("/statuses/me/1", headers=headers, json={"status": "Смотрю"})).status_code
+             for _ in range(15)]
+    assert codes[:10] == [200] * 10
+    assert 429 in codes
+
+    response = await client.post("/statuses/me/1", headers=headers, json={"status": "Смотрю"})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+    # У другого пользователя своя корзина
+    await register(client, "other@example.com")
+    other_headers = await login(client, "other@example.com")
+    assert (await client.post("/statuses/me/1", headers=other_headers, json={"status": "Смотрю"})).status_code == 200
+
+
+async def test_rate_limit_anonymous(client, films):
+    codes = [(await client.get("/films/1")).status_code for _ in range(60)]
+    assert codes[:40] == [200] * 40
+    assert codes[-1] == 429
+
+
+async def test_limits_metrics(client, films):
+    await client.get("/films/1")
+    response = await client.get("/metrics/limits")
+    assert response.status_code == 200
+    assert response.json()["rate_limits"]["films:get_film"]["allowed"] >= 1
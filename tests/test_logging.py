@@ -0,0 +1,47 @@
+import io
+import json
+import logging
+
+from src.utils.logging_util import JsonFormatter, create_queue_handler
+
+
+def log_through_queue(log) -> list:
+    """
+    Пишет записи через очередь, как в приложении, и возвращает разобранные JSON-строки
+    """
+    stream = io.StringIO()
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(JsonFormatter())
+    queue_handler, listener = create_queue_handler(stream_handler)
+
+    logger = logging.getLogger("tests.logging")
+    logger.propagate = False
+    logger.addHandler(queue_handler)
+    listener.start()
+    try:
+        log(logger)
+    finally:
+        listener.stop()
+        logger.removeHandler(queue_handler)
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_message_and_extra_fields():
+    [record] = log_through_queue(lambda logger: logger.warning("%s %s", "GET", "/films/1", extra={"status_code": 200}))
+    assert record["message"] == "GET /films/1"
+    assert record["level"] == "WARNING"
+    assert record["status_code"] == 200
+    assert "exc_info" not in record
+
+
+def test_traceback_is_a_separate_field():
+    def log(logger):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("Ошибка %s", "деления")
+
+    [record] = log_through_queue(log)
+    assert record["message"] == "Ошибка деления"
+    assert record["exc_info"].startswith("Traceback")
+    assert "ZeroDivisionError" in record["exc_info"]
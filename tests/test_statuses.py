@@ -0,0 +1,112 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+WATCHED = {"status": "Посмотрел", "rating": 8}
+WATCHING = {"status": "Смотрю", "rating": 6}
+
+
+async def test_create_and_update_my_status(client, repository, films, user):
+    data, headers = user
+    response = await client.post("/statuses/me/1", headers=headers, json=WATCHING)
+    assert response.status_code == 200
+    assert response.json() == {"user_id": data["id"], "film_id": 1, "status": "Смотрю", "rating": 6}
+
+    response = await client.post("/statuses/me/1", headers=headers, json=WATCHED)
+    assert response.json()["status"] == "Посмотрел"
+
+    response = await client.get("/statuses/me/1", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["rating"] == 8
+
+    # Каждое изменение записывается в журнал событий
+    assert [(event.status.name, event.previous_status and event.previous_status.name)
+            for event in repository.events] == [("watching", None), ("watched", "watching")]
+
+
+async def test_status_of_missing_film(client, films, user):
+    _, headers = user
+    assert (await client.post("/statuses/me/404", headers=headers, json=WATCHED)).status_code == 404
+    assert (await client.get("/statuses/me/2", headers=headers)).status_code == 404
+
+
+async def test_my_statuses(client, films, user):
+    _, headers = user
+    assert (await client.get("/statuses/me", headers=headers)).status_code == 404
+
+    await client.post("/statuses/me/1", headers=headers, json=WATCHED)
+    await client.post("/statuses/me/2", headers=headers, json=WATCHING)
+
+    response = await client.get("/statuses/me", headers=headers)
+    assert sorted(item["film_id"] for item in response.json()) == [1, 2]
+
+    response = await client.get("/statuses/me/by_status/Смотрю", headers=headers)
+    assert [item["film_id"] for item in response.json()] == [2]
+
+
+async def test_my_statuses_cache_is_invalidated(client, films, user):
+    _, headers = user
+    await client.post("/statuses/me/1", headers=headers, json=WATCHING)
+    assert (await client.get("/statuses/me", headers=headers)).json()[0]["status"] == "Смотрю"
+
+    await client.post("/statuses/me/1", headers=headers, json=WATCHED)
+    assert (await client.get("/statuses/me", headers=headers)).json()[0]["status"] == "Посмотрел"
+
+
+async def test_watchlist(client, films, user):
+    _, headers = user
+    for film_id in (1, 2, 3):
+        await client.post(f"/statuses/me/{film_id}", headers=headers, json=WATCHED)
+    await client.post("/statuses/me/1", headers=headers, json=WATCHING)
+
+    response = await client.get("/statuses/me/watchlist", headers=headers, params={"limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert page["total"] == 3
+    # Сначала недавно измененные
+    assert [item["film"]["kinopoisk_id"] for item in page["items"]] == [1, 3]
+    assert page["items"][0]["film"]["name"] == "Фильм 1"
+
+    page = (await client.get("/statuses/me/watchlist", headers=headers, params={"limit": 2, "offset": 2})).json()
+    assert [item["film"]["kinopoisk_id"] for item in page["items"]] == [2]
+
+    page = (await client.get("/statuses/me/watchlist", headers=headers, params={"status": "Посмотрел"})).json()
+    assert page["total"] == 2
+
+    page = (await client.get("/statuses/me/watchlist", headers=headers, params={"offset": 10})).json()
+    assert page == {"items": [], "total": 3, "limit": 20, "offset": 10}
+
+
+async def test_watchlist_limit_is_bounded(client, user):
+    _, headers = user
+    response = await client.get("/statuses/me/watchlist", headers=headers, params={"limit": 10 ** 6})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("method,path", [
+    ("GET", "/statuses/1"),
+    ("GET", "/statuses/1/1"),
+    ("GET", "/statuses/1/watchlist"),
+    ("GET", "/statuses/1/export"),
+    ("GET", "/statuses/get_user_statuses_by_status/1/Смотрю"),
+    ("GET", "/films/export"),
+])
+async def test_superuser_only(client, films, user, superuser, method, path):
+    _, user_headers = user
+    _, superuser_headers = superuser
+    assert (await client.request(method, path, headers=user_headers)).status_code == 403
+    assert (await client.request(method, path, headers=superuser_headers)).status_code != 403
+
+
+async def test_superuser_reads_user_statuses(client, films, user, superuser):
+    data, headers = user
+    _, superuser_headers = superuser
+    await client.post("/statuses/me/2", headers=headers, json=WATCHED)
+
+    response = await client.get(f"/statuses/{data['id']}", headers=superuser_headers)
+    assert [item["film_id"] for item in response.json()] == [2]
+
+    response = await client.get(f"/statuses/{data['id']}/watchlist", headers=superuser_headers)
+    assert response.json()["total"] == 1
+
+    assert (await client.get("/statuses/404", headers=superuser_headers)).status_code == 404